@@ -0,0 +1,439 @@
+"""قياس أداء رفع الملفات مقابل خادم Bot API وهمي محلي
+
+يشغّل خادماً يحاكي Bot API (تأخير، حد لعرض النطاق، أخطاء 429 عشوائية) ثم يرفع
+مجموعات ملفات مصطنعة عبر TelegramVideoUploader ويعرض عدد الملفات والميجابايتات
+في الثانية وزمن الملف (p50/p99) وأقصى استهلاك للذاكرة.
+
+أمثلة:
+    python benchmark.py
+    python benchmark.py --latency 0.2 --bandwidth 20MB --flood-rate 0.05
+    python benchmark.py --sets small --modes batch,album --workers 8
+    python benchmark.py --limits unthrottled
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional, Any
+
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024**2, 'GB': 1024**3}
+READ_CHUNK = 256 * 1024
+HEAD_LIMIT = 64 * 1024  # حقول الطلب النصية تسبق محتوى الملفات في multipart
+BENCH_TOKEN = "123456:benchmark"
+BENCH_CHAT_ID = "-1001000000001"
+# حدود المعدل لكل سيناريو: default يقيس ما يواجهه المستخدم فعلاً، وunthrottled سرعة مسار الرفع وحده
+LIMIT_PROFILES = {
+    'default': {},
+    'unthrottled': {'global_rate_limit': 1000, 'chat_rate_limit': 100000}
+}
+MEDIA_KEYS = {
+    'sendDocument': 'document',
+    'sendVideo': 'video',
+    'sendPhoto': 'photo',
+    'sendAudio': 'audio'
+}
+
+
+def parse_size(value: str) -> int:
+    """تحويل حجم مثل "256KB" إلى عدد بايتات"""
+    text = value.strip().upper()
+    for unit in ('GB', 'MB', 'KB', 'B'):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)].strip()) * SIZE_UNITS[unit])
+    return int(float(text))
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """النسبة المئوية بطريقة أقرب رتبة"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(percent / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Throttle:
+    """حد مشترك لعرض النطاق بين كل اتصالات الخادم (بايت/ثانية)"""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_free = time.monotonic()
+
+    def consume(self, count: int):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.next_free = max(now, self.next_free) + count / self.rate
+            wait = self.next_free - now
+        time.sleep(wait)
+
+
+class FakeBotAPIHandler(BaseHTTPRequestHandler):
+    """معالج يحاكي ردود Bot API لطرق الإرسال المستخدمة في الرفع"""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    flood_rate = 0.0
+    retry_after = 1
+    throttle = Throttle(0)
+    counter = 0
+    counter_lock = threading.Lock()
+
+    def log_message(self, *args: Any):
+        pass
+
+    def read_body(self) -> bytes:
+        """قراءة جسم الطلب مع الاحتفاظ ببدايته فقط (محتوى الملفات يُهمل)"""
+        head = bytearray()
+
+        def consume(chunk: bytes):
+            if len(head) < HEAD_LIMIT:
+                head.extend(chunk[:HEAD_LIMIT - len(head)])
+            self.throttle.consume(len(chunk))
+
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                remaining = size
+                while remaining:
+                    chunk = self.rfile.read(min(READ_CHUNK, remaining))
+                    remaining -= len(chunk)
+                    consume(chunk)
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get('Content-Length', 0))
+            while remaining:
+                chunk = self.rfile.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                consume(chunk)
+        return bytes(head)
+
+    def request_field(self, head: bytes, name: str) -> Optional[str]:
+        """قيمة حقل نصي من جسم الطلب (multipart أو form أو JSON)"""
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/'):
+            match = re.search(rb'name="' + name.encode() + rb'"\r\n(?:[^\r\n]+\r\n)*\r\n(.*?)\r\n--', head, re.S)
+            return match.group(1).decode() if match else None
+        if content_type.startswith('application/json'):
+            value = json.loads(head or b'{}').get(name)
+            return value if value is None or isinstance(value, str) else json.dumps(value)
+        return dict(urllib.parse.parse_qsl(head.decode())).get(name)
+
+    def next_id(self) -> int:
+        with self.counter_lock:
+            FakeBotAPIHandler.counter += 1
+            return FakeBotAPIHandler.counter
+
+    def message(self, media_type: str) -> Dict[str, Any]:
+        message_id = self.next_id()
+        media = {'file_id': f"BENCH{message_id}", 'file_unique_id': f"U{message_id}"}
+        if media_type == 'photo':
+            media = [{**media, 'width': 1280, 'height': 720}]
+        elif media_type == 'video':
+            media.update(width=1280, height=720, duration=1)
+        elif media_type == 'audio':
+            media.update(duration=1)
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(BENCH_CHAT_ID), 'type': 'channel', 'title': 'benchmark'},
+            media_type: media
+        }
+
+    def reply(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        method = self.path.rsplit('/', 1)[-1]
+        head = self.read_body()
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method.startswith('send') and random.random() < self.flood_rate:
+            self.reply(429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f"Too Many Requests: retry after {self.retry_after}",
+                'parameters': {'retry_after': self.retry_after}
+            })
+            return
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Benchmark', 'username': 'benchmark_bot'}
+        elif method in MEDIA_KEYS:
+            result = self.message(MEDIA_KEYS[method])
+        elif method == 'sendMediaGroup':
+            media = json.loads(self.request_field(head, 'media') or '[]')
+            result = [self.message(item.get('type', 'document')) for item in media]
+        else:
+            result = True
+        self.reply(200, {'ok': True, 'result': result})
+
+
+def run_server(settings: Dict[str, Any], port_queue: Any):
+    """تشغيل الخادم الوهمي في عملية منفصلة حتى لا يؤثر على قياس ذاكرة الرافع"""
+    FakeBotAPIHandler.latency = settings['latency']
+    FakeBotAPIHandler.flood_rate = settings['flood_rate']
+    FakeBotAPIHandler.retry_after = settings['retry_after']
+    FakeBotAPIHandler.throttle = Throttle(settings['bandwidth'])
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeBotAPIHandler)
+    server.daemon_threads = True
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def make_files(directory: str, count: int, size: int, extension: str) -> List[str]:
+    """إنشاء ملفات مصطنعة بالحجم المطلوب (كتلة عشوائية مكررة لسرعة الإنشاء)"""
+    os.makedirs(directory, exist_ok=True)
+    block = os.urandom(min(size, 1024 * 1024)) or b'\0'
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i:05d}{extension}")
+        with open(path, 'wb') as f:
+            remaining = size
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+        paths.append(path)
+    return paths
+
+
+async def drive_uploader(paths: List[str], mode: str) -> Dict[str, Any]:
+    """رفع الملفات بالطريقة المطلوبة وجمع القياسات من سجل الرفع"""
+    import logging
+    import upload_bot
+
+    # upload_bot يضبط مستوى السجل عند استيراده، لذا يُخفض بعده
+    logging.getLogger().setLevel(logging.ERROR)
+    uploader = upload_bot.TelegramVideoUploader(BENCH_TOKEN)
+    uploader.headless = True
+    uploader.emit_event = lambda *args, **kwargs: None
+    uploader.render_progress = lambda progress: None
+    files = [uploader.build_file_info(path) for path in paths]
+
+    started = time.monotonic()
+    if mode == 'sequential':
+        results = [
+            await uploader.upload_file(file_info, BENCH_CHAT_ID, i, len(files))
+            for i, file_info in enumerate(files, 1)
+        ]
+        retries = sum(entry.get('retries', 0) for entry in uploader.upload_history)
+    else:
+        uploader.config['album_mode'] = mode == 'album'
+        stats = {}
+        results = await uploader.upload_batch(files, BENCH_CHAT_ID, stats=stats)
+        retries = stats.get('retries', 0)
+    elapsed = time.monotonic() - started
+    uploader.store.flush()
+
+    durations = [entry['duration'] for entry in uploader.upload_history if 'duration' in entry]
+    return {
+        'files': len(files),
+        'bytes': sum(f['size'] for f in files),
+        'elapsed': elapsed,
+        'failed': sum(1 for success, _ in results if not success),
+        'retries': retries,
+        'durations': durations
+    }
+
+
+def run_scenario(scenario: Dict[str, Any], result_queue: Any):
+    """تشغيل سيناريو واحد في عملية جديدة ليكون أقصى استهلاك للذاكرة خاصاً به"""
+    os.environ['HOME'] = scenario['home']
+    os.chdir(scenario['workdir'])
+    sys.path.insert(0, scenario['repo_dir'])
+
+    try:
+        metrics = asyncio.run(drive_uploader(scenario['paths'], scenario['mode']))
+        metrics['peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        result_queue.put(metrics)
+    except Exception as e:
+        result_queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def wait_for_result(process: Any, result_queue: Any, timeout: float) -> Dict[str, Any]:
+    """انتظار نتيجة السيناريو مع مهلة، مع اكتشاف العملية التي انتهت دون نتيجة"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return result_queue.get(timeout=1)
+        except queue.Empty:
+            pass
+        if not process.is_alive():
+            # قد تصل النتيجة بعد خروج العملية مباشرة
+            try:
+                return result_queue.get(timeout=1)
+            except queue.Empty:
+                return {'error': f"انتهت العملية دون نتيجة (رمز الخروج {process.exitcode})"}
+        if time.monotonic() > deadline:
+            process.terminate()
+            return {'error': f"تجاوز المهلة ({timeout:.0f} ثانية)"}
+
+
+def format_size(size: float) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
+
+
+def print_report(rows: List[Dict[str, Any]]):
+    """جدول النتائج"""
+    header = f"{'المجموعة':<10} {'الطريقة':<11} {'الحدود':<12} {'ملفات':>6} {'ملف/ث':>8} {'MB/ث':>8} {'p50':>8} {'p99':>8} {'فشل':>5} {'إعادة':>6} {'الذاكرة':>10}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        if 'error' in row:
+            print(f"{row['set']:<10} {row['mode']:<11} {row['limits']:<12} ❌ {row['error']}")
+            continue
+        p50 = f"{row['p50']:.3f}s" if row['p50'] is not None else '-'
+        p99 = f"{row['p99']:.3f}s" if row['p99'] is not None else '-'
+        print(
+            f"{row['set']:<10} {row['mode']:<11} {row['limits']:<12} {row['files']:>6} {row['files_per_sec']:>8.1f}"
+            f" {row['mb_per_sec']:>8.1f} {p50:>8} {p99:>8} {row['failed']:>5} {row['retries']:>6}"
+            f" {format_size(row['peak_rss']):>10}"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="قياس أداء الرفع مقابل خادم Bot API وهمي محلي")
+    parser.add_argument('--sets', default='small,huge', help="مجموعات الملفات: small,huge")
+    parser.add_argument('--modes', default='sequential,batch', help="طرق الرفع: sequential,batch,album")
+    parser.add_argument('--small-count', type=int, default=200)
+    parser.add_argument('--small-size', default='256KB')
+    parser.add_argument('--small-ext', default='.jpg', help="امتداد الملفات الصغيرة (يحدد نوع الرفع)")
+    parser.add_argument('--huge-count', type=int, default=3)
+    parser.add_argument('--huge-size', default='200MB')
+    parser.add_argument('--huge-ext', default='.bin')
+    parser.add_argument('-w', '--workers', type=int, default=3, help="عدد الرفعات المتزامنة")
+    parser.add_argument('--latency', type=float, default=0.05, help="تأخير الخادم لكل طلب (ثانية)")
+    parser.add_argument('--bandwidth', default='0', help="حد عرض النطاق الكلي للخادم مثل 50MB (0 = بلا حد)")
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="نسبة طلبات الإرسال التي تُرد بخطأ 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="قيمة retry_after في ردود 429 (ثانية)")
+    parser.add_argument('--limits', default='default,unthrottled',
+                        help="حدود المعدل: default (إعدادات المستخدم الافتراضية)، unthrottled (بلا حد فعلي)")
+    parser.add_argument('--timeout', type=float, default=3600, help="أقصى مدة لكل سيناريو (ثانية)")
+    parser.add_argument('--config', default='{}', help="إعدادات إضافية للرافع بصيغة JSON")
+    parser.add_argument('--json', action='store_true', help="طباعة النتائج بصيغة JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    sets = {
+        'small': (args.small_count, parse_size(args.small_size), args.small_ext),
+        'huge': (args.huge_count, parse_size(args.huge_size), args.huge_ext)
+    }
+    chosen_sets = [name.strip() for name in args.sets.split(',') if name.strip()]
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    limits = [name.strip() for name in args.limits.split(',') if name.strip()]
+    for name in chosen_sets:
+        if name not in sets:
+            print(f"❌ مجموعة غير معروفة: {name}")
+            return 2
+    for mode in modes:
+        if mode not in ('sequential', 'batch', 'album'):
+            print(f"❌ طريقة غير معروفة: {mode}")
+            return 2
+    for name in limits:
+        if name not in LIMIT_PROFILES:
+            print(f"❌ حدود غير معروفة: {name}")
+            return 2
+
+    ctx = multiprocessing.get_context('spawn')
+    port_queue = ctx.Queue()
+    server = ctx.Process(target=run_server, args=({
+        'latency': args.latency,
+        'flood_rate': args.flood_rate,
+        'retry_after': args.retry_after,
+        'bandwidth': parse_size(args.bandwidth)
+    }, port_queue), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=30)
+
+    workdir = tempfile.mkdtemp(prefix='tg_bench_')
+    rows = []
+    try:
+        for set_name in chosen_sets:
+            count, size, extension = sets[set_name]
+            if not args.json:
+                print(f"📦 إنشاء {count} ملف بحجم {format_size(size)} ({set_name})...")
+            paths = make_files(os.path.join(workdir, 'files', set_name), count, size, extension)
+
+            for mode, limit_name in [(mode, name) for mode in modes for name in limits]:
+                # بيئة نظيفة لكل سيناريو: إعدادات وقاعدة بيانات وذاكرة مؤقتة جديدة
+                home = tempfile.mkdtemp(prefix='home_', dir=workdir)
+                with open(os.path.join(home, '.telegram_uploader_config.json'), 'w', encoding='utf-8') as f:
+                    json.dump({
+                        'api_base_url': f"http://127.0.0.1:{port}/bot",
+                        'upload_workers': args.workers,
+                        'dedup_mode': 'off',
+                        'thumbnails': False,
+                        **LIMIT_PROFILES[limit_name],
+                        **json.loads(args.config)
+                    }, f)
+
+                result_queue = ctx.Queue()
+                process = ctx.Process(target=run_scenario, args=({
+                    'home': home,
+                    'workdir': home,
+                    'repo_dir': os.path.dirname(os.path.abspath(__file__)),
+                    'paths': paths,
+                    'mode': mode
+                }, result_queue))
+                process.start()
+                metrics = wait_for_result(process, result_queue, args.timeout)
+                process.join()
+
+                row = {'set': set_name, 'mode': mode, 'limits': limit_name, **metrics}
+                if 'error' not in row:
+                    elapsed = max(row['elapsed'], 1e-9)
+                    row['files_per_sec'] = row['files'] / elapsed
+                    row['mb_per_sec'] = row['bytes'] / elapsed / 1024**2
+                    row['p50'] = percentile(row['durations'], 50)
+                    row['p99'] = percentile(row['durations'], 99)
+                    del row['durations']
+                rows.append(row)
+                if not args.json:
+                    print(f"   {'❌' if 'error' in row else '✅'} {set_name}/{mode}/{limit_name} انتهى")
+
+            shutil.rmtree(os.path.join(workdir, 'files', set_name), ignore_errors=True)
+    finally:
+        server.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print()
+        print_report(rows)
+    return 1 if any('error' in row or row['failed'] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,51 @@
+import argparse
 import asyncio
+import contextlib
+import contextvars
+import fnmatch
+import hashlib
+import io
+import json
 import logging
 import os
+import random
+import shutil
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import threading
 import time
 import glob
+import importlib.util
 import mimetypes
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple, Any
+from types import MappingProxyType
+from typing import List, Dict, Optional, Tuple, Any, Callable, Iterable, Iterator
 
-from telegram import Bot, InputFile
+import httpx
+from telegram import Bot, InputFile, InputMediaAudio, InputMediaDocument, InputMediaPhoto, InputMediaVideo
 from telegram.constants import ParseMode
-from telegram.error import TelegramError
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
+
+try:
+    import inotify_simple
+except ImportError:  # المراقبة تعمل بالاستطلاع الدوري عند غياب inotify
+    inotify_simple = None
 
 # إعداد الـ logging المتقدم
+console_handler = logging.StreamHandler()
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO,
     handlers=[
         logging.FileHandler('telegram_uploader.log'),
-        logging.StreamHandler()
+        console_handler
     ]
 )
 logger = logging.getLogger(__name__)
@@ -31,12 +57,90 @@ BOT_TOKEN = "7951915347:AAEauEVFZbQ6TizUNQalxJJOpMRLyNXOVF0"
 MAX_FILE_SIZE = 2 * 1024 * 1024 * 1024  # 2GB
 MAX_VIDEO_SIZE = 50 * 1024 * 1024  # 50MB
 MAX_DOCUMENT_SIZE = 2 * 1024 * 1024 * 1024  # 2GB
+MAX_PHOTO_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_ALBUM_SIZE = 10  # أقصى عدد عناصر في send_media_group
+SEARCH_RESULTS_LIMIT = 5000  # أقصى عدد نتائج البحث الشامل المعروضة
 VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.3gp']
 AUDIO_EXTENSIONS = ['.mp3', '.wav', '.flac', '.aac', '.ogg', '.m4a', '.wma']
 IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico']
+PHOTO_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.webp'})  # الصيغ التي تقبلها تيليجرام كصورة
 DOCUMENT_EXTENSIONS = ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.xls', '.xlsx', '.ppt', '.pptx']
 ARCHIVE_EXTENSIONS = ['.zip', '.rar', '.7z', '.tar', '.gz', '.bz2']
 CODE_EXTENSIONS = ['.py', '.js', '.html', '.css', '.cpp', '.c', '.java', '.php', '.go', '.rs']
+FILTER_EXTENSIONS = {
+    'video': VIDEO_EXTENSIONS,
+    'audio': AUDIO_EXTENSIONS,
+    'image': IMAGE_EXTENSIONS,
+    'document': DOCUMENT_EXTENSIONS,
+    'archive': ARCHIVE_EXTENSIONS,
+    'code': CODE_EXTENSIONS
+}
+# جدول ثابت من الامتداد إلى نوع الملف، يستخدمه التصفية والأيقونات وتوجيه الرفع
+EXTENSION_TYPES = MappingProxyType({
+    extension: file_type
+    for file_type, extensions in FILTER_EXTENSIONS.items()
+    for extension in extensions
+})
+FILE_TYPE_ICONS = MappingProxyType({
+    'video': "🎬",
+    'audio': "🎵",
+    'image': "🖼️",
+    'document': "📄",
+    'archive': "📦",
+    'code': "💻"
+})
+FILE_TYPE_NAMES = MappingProxyType({
+    'video': "فيديو",
+    'audio': "صوت",
+    'image': "صورة",
+    'document': "وثيقة",
+    'archive': "أرشيف",
+    'code': "كود"
+})
+# بصمات بداية الملف لتصنيف الملفات التي بلا امتداد: (الموضع، البايتات، النوع)
+MAGIC_SIGNATURES = (
+    (0, b'\x1aE\xdf\xa3', 'video'),  # mkv / webm
+    (4, b'ftypM4A', 'audio'),
+    (4, b'ftyp', 'video'),  # mp4 / mov / 3gp
+    (0, b'FLV', 'video'),
+    (8, b'AVI ', 'video'),
+    (8, b'WAVE', 'audio'),
+    (8, b'WEBP', 'image'),
+    (0, b'ID3', 'audio'),
+    (0, b'\xff\xfb', 'audio'),
+    (0, b'\xff\xf3', 'audio'),
+    (0, b'fLaC', 'audio'),
+    (0, b'OggS', 'audio'),
+    (0, b'\xff\xd8\xff', 'image'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image'),
+    (0, b'GIF8', 'image'),
+    (0, b'%PDF', 'document'),
+    (0, b'PK\x03\x04', 'archive'),
+    (0, b'Rar!\x1a\x07', 'archive'),
+    (0, b'7z\xbc\xaf\x27\x1c', 'archive'),
+    (0, b'\x1f\x8b', 'archive'),
+    (0, b'BZh', 'archive'),
+)
+MAGIC_HEADER_SIZE = 16
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024**2, 'GB': 1024**3}
+SPLIT_BUFFER_SIZE = 4 * 1024 * 1024  # 4MB
+FINGERPRINT_SAMPLE_SIZE = 1024 * 1024  # 1MB من بداية ونهاية الملف
+PROGRESS_REFRESH_INTERVAL = 0.5  # أقل فترة بين تحديثين لشريط التقدم (ثانية)
+SPEED_WINDOW = 5.0  # نافذة حساب السرعة الحالية (ثانية)
+CACHE_DIR = os.path.expanduser("~/.cache/telegram_uploader")
+TRANSCODE_CACHE_DIR = os.path.join(CACHE_DIR, "transcoded")
+CACHE_TEMP_SUFFIX = ".part"  # ملفات الذاكرة المؤقتة الجاري كتابتها
+TRANSCODE_PRESET = "medium"
+THUMBNAIL_CACHE_DIR = os.path.join(CACHE_DIR, "thumbnails")
+THUMBNAIL_SIZE = 320  # أقصى عرض وارتفاع تقبلهما تيليجرام للصورة المصغرة
+KEEPALIVE_EXPIRY = 60.0  # مدة إبقاء الاتصالات الخاملة مفتوحة (ثانية)
+SERVER_PROCESS_SPEED = 20 * 1024 * 1024  # تقدير بطيء لسرعة معالجة الخادم للملف بعد استلامه (بايت/ثانية)
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# دالة عدّ البايتات للرفع الجاري في المهمة الحالية، ودفعة الرفع التي ينتمي إليها
+UPLOAD_PROGRESS: contextvars.ContextVar[Optional[Callable[[int], None]]] = contextvars.ContextVar('upload_progress', default=None)
+BATCH_PROGRESS: contextvars.ContextVar[Optional['UploadProgress']] = contextvars.ContextVar('batch_progress', default=None)
+CURRENT_JOB: contextvars.ContextVar[Optional['UploadJob']] = contextvars.ContextVar('current_job', default=None)
 
 class Colors:
     """ألوان للطباعة في الطرفية"""
@@ -50,31 +154,1384 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+class TokenBucket:
+    """محدد معدل تكيفي بنظام دلو الرموز
+
+    يبدأ بالمعدل الأقصى، وكل RetryAfter يخفض المعدل إلى النصف (حتى min_rate)،
+    ثم يعود المعدل تدريجياً نحو الأقصى بمقدار max_rate كل recovery_seconds ثانية.
+    """
+    
+    def __init__(self, rate: float, capacity: float, min_rate: Optional[float] = None,
+                 recovery_seconds: float = 60.0):
+        self.max_rate = rate
+        self.rate = rate  # رموز في الثانية
+        self.min_rate = min_rate if min_rate is not None else rate / 20
+        self.recovery = rate / recovery_seconds  # زيادة المعدل في كل ثانية بلا تجاوز للحد
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+    
+    def refill(self, now: float):
+        """إعادة ملء الدلو واسترجاع المعدل حسب الوقت المنقضي
+
+        فترة الإيقاف لا تُحتسب، فلا تتراكم رموز ولا يُسترجع المعدل أثناءها.
+        """
+        start = max(self.updated, self.blocked_until)
+        elapsed = max(0.0, now - start)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.rate = min(self.max_rate, self.rate + elapsed * self.recovery)
+        self.updated = max(now, start)
+    
+    async def acquire(self):
+        """انتظار رمز متاح ثم استهلاكه"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if self.blocked_until > now:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def slow_down(self, factor: float = 0.5):
+        """خفض المعدل (يُسترجع تدريجياً)"""
+        self.refill(time.monotonic())
+        self.rate = max(self.min_rate, self.rate * factor)
+    
+    def penalize(self, seconds: float):
+        """إيقاف الدلو لمدة يحددها تيليجرام وتفريغه وخفض معدله"""
+        self.slow_down()
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """استخراج مدة الانتظار من RetryAfter (رقم أو timedelta حسب إصدار المكتبة)"""
+    retry_after = error.retry_after
+    if hasattr(retry_after, 'total_seconds'):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+def sniff_file_type(path: str) -> Optional[str]:
+    """تصنيف ملف بلا امتداد من بايتاته الأولى (None إن لم يُعرف)"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(MAGIC_HEADER_SIZE)
+    except OSError:
+        return None
+    for offset, signature, file_type in MAGIC_SIGNATURES:
+        if header[offset:offset + len(signature)] == signature:
+            return file_type
+    return None
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """هل الخطأ مؤقت (انقطاع شبكة أو انتهاء مهلة) فتفيد معه إعادة المحاولة؟
+
+    BadRequest وForbidden يرثان NetworkError في المكتبة لكنهما خطآن دائمان.
+    """
+    if isinstance(error, (BadRequest, Forbidden)):
+        return False
+    return isinstance(error, (NetworkError, httpx.TransportError, ConnectionError))
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """مدة انتظار أسية مع تشويش عشوائي حتى لا تعيد كل الرفعات المحاولة في نفس اللحظة"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def parse_size(value: Any) -> int:
+    """تحويل حجم مثل "1.5GB" إلى عدد بايتات"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().upper()
+    for unit in ('GB', 'MB', 'KB', 'B'):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)].strip()) * SIZE_UNITS[unit])
+    return int(float(text))
+
+
+def hash_file_range(file_path: str, offset: int = 0, length: Optional[int] = None) -> str:
+    """بصمة SHA-256 لجزء من ملف (أو الملف كاملاً) عبر قراءة مخزنة دون تحميله في الذاكرة"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        remaining = length if length is not None else float('inf')
+        while remaining > 0:
+            chunk = f.read(int(min(SPLIT_BUFFER_SIZE, remaining)))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def compute_folder_size(folder_path: str, stop: Optional[threading.Event] = None) -> Optional[int]:
+    """حساب الحجم الكامل لمجلد عبر os.scandir دون تتبع روابط المجلدات
+
+    يعيد None إذا أُوقف الحساب عبر stop قبل اكتماله.
+    """
+    total_size = 0
+    pending_dirs = [folder_path]
+    while pending_dirs:
+        if stop is not None and stop.is_set():
+            return None
+        current = pending_dirs.pop()
+        try:
+            with os.scandir(current) as iterator:
+                for entry in iterator:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending_dirs.append(entry.path)
+                        else:
+                            total_size += entry.stat().st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total_size
+
+
+def transcode_video(source_path: str, output_path: str, crf: int) -> str:
+    """ضغط فيديو إلى MP4 (H.264/AAC) قابل للتشغيل المتدفق باستخدام ffmpeg
+
+    الكتابة في ملف مؤقت باسم فريد بنفس المجلد، فلا تتداخل دفعتان تضغطان نفس الملف.
+    """
+    fd, temp_path = tempfile.mkstemp(
+        prefix=os.path.basename(output_path) + '.', suffix=CACHE_TEMP_SUFFIX + '.mp4',
+        dir=os.path.dirname(output_path)
+    )
+    os.close(fd)
+    result = subprocess.run(
+        ['ffmpeg', '-y', '-v', 'error', '-i', source_path,
+         '-c:v', 'libx264', '-preset', TRANSCODE_PRESET, '-crf', str(crf),
+         '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', temp_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise RuntimeError(result.stderr.strip()[-500:] or f"ffmpeg exit code {result.returncode}")
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def extract_thumbnail(source_path: str, output_path: str, offset: float) -> str:
+    """استخراج إطار واحد من الفيديو كصورة مصغرة JPEG باستخدام ffmpeg
+
+    الكتابة في ملف مؤقت باسم فريد كما في transcode_video.
+    """
+    fd, temp_path = tempfile.mkstemp(
+        prefix=os.path.basename(output_path) + '.', suffix=CACHE_TEMP_SUFFIX + '.jpg',
+        dir=os.path.dirname(output_path)
+    )
+    os.close(fd)
+    result = subprocess.run(
+        ['ffmpeg', '-y', '-v', 'error', '-ss', f"{offset:.2f}", '-i', source_path,
+         '-frames:v', '1', '-vf', f"scale='min({THUMBNAIL_SIZE},iw)':'min({THUMBNAIL_SIZE},ih)':force_original_aspect_ratio=decrease", '-q:v', '5', temp_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0 or not os.path.getsize(temp_path):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise RuntimeError(result.stderr.strip()[-500:] or f"ffmpeg exit code {result.returncode}")
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def prune_cache_dir(directory: str, max_bytes: int, keep: Iterable[str] = ()):
+    """حذف أقدم الملفات استخداماً حتى يصبح حجم المجلد ضمن الحد (LRU حسب وقت التعديل)
+
+    الملفات في keep (قيد الاستخدام) والملفات المؤقتة الجاري كتابتها لا تُحذف.
+    """
+    keep = set(keep)
+    try:
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.path in keep or CACHE_TEMP_SUFFIX in entry.name:
+                continue
+            if entry.is_file():
+                entry_stat = entry.stat()
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+    except OSError:
+        return
+    entries.sort()
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            continue
+
+
+def probe_media(file_path: str) -> Dict[str, Any]:
+    """قراءة أبعاد ومدة وترميز الفيديو باستخدام ffprobe"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=width,height,codec_name:format=duration', '-of', 'json', file_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        return {}
+    data = json.loads(result.stdout or '{}')
+    stream = (data.get('streams') or [{}])[0]
+    duration = data.get('format', {}).get('duration')
+    return {
+        'width': int(stream.get('width') or 0),
+        'height': int(stream.get('height') or 0),
+        'duration': float(duration) if duration not in (None, 'N/A') else 0.0,
+        'codec': stream.get('codec_name')
+    }
+
+
+def file_fingerprint(file_path: str, file_size: int, full_hash: bool = False, offset: int = 0) -> str:
+    """بصمة محتوى الملف: الحجم مع بداية ونهاية الملف، أو بصمة كاملة عند الطلب
+
+    offset يحدد بداية المحتوى لأجزاء الملفات المقسمة (file_size هو حجم الجزء).
+    """
+    digest = hashlib.sha256(str(file_size).encode())
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        if full_hash:
+            remaining = file_size
+            while remaining > 0:
+                chunk = f.read(min(SPLIT_BUFFER_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+            return f"full:{digest.hexdigest()}"
+        
+        digest.update(f.read(min(FINGERPRINT_SAMPLE_SIZE, file_size)))
+        if file_size > FINGERPRINT_SAMPLE_SIZE:
+            f.seek(offset + max(FINGERPRINT_SAMPLE_SIZE, file_size - FINGERPRINT_SAMPLE_SIZE))
+            digest.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+    return f"quick:{digest.hexdigest()}"
+
+
+class SelectionSet:
+    """الملفات المختارة مفهرسة بالمسار مع الحفاظ على ترتيب الاختيار
+
+    الإضافة والحذف والتحقق من العضوية O(1)، وعدد الملفات وحجمها الإجمالي
+    محدثان باستمرار فلا يُعاد جمعهما عند كل رسم للشاشة.
+    """
+    
+    def __init__(self, files: Iterable[Dict[str, Any]] = ()):
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.total_size = 0
+        self.update(files)
+    
+    def __len__(self) -> int:
+        return len(self.files)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.files.values())
+    
+    def __contains__(self, item: Any) -> bool:
+        path = item['path'] if isinstance(item, dict) else item
+        return path in self.files
+    
+    def add(self, file_info: Dict[str, Any]) -> bool:
+        """إضافة ملف، وFalse إن كان مختاراً مسبقاً"""
+        if file_info['path'] in self.files:
+            return False
+        self.files[file_info['path']] = file_info
+        self.total_size += file_info['size']
+        return True
+    
+    def discard(self, path: str) -> bool:
+        """إزالة ملف بمساره، وFalse إن لم يكن مختاراً"""
+        file_info = self.files.pop(path, None)
+        if file_info is None:
+            return False
+        self.total_size -= file_info['size']
+        return True
+    
+    def toggle(self, file_info: Dict[str, Any]) -> bool:
+        """عكس حالة اختيار الملف، وTrue إن أصبح مختاراً"""
+        if self.discard(file_info['path']):
+            return False
+        return self.add(file_info)
+    
+    def update(self, files: Iterable[Dict[str, Any]]) -> int:
+        """إضافة عدة ملفات وإعادة عدد ما أضيف فعلاً"""
+        return sum(1 for file_info in files if self.add(file_info))
+    
+    def clear(self):
+        self.files.clear()
+        self.total_size = 0
+    
+    def head(self, count: int) -> List[Dict[str, Any]]:
+        """أول count ملف بترتيب الاختيار"""
+        return list(islice(self.files.values(), count))
+
+
+def parse_index_ranges(text: str, count: int) -> List[int]:
+    """تحويل "3-10" أو "1,4,7-9" إلى فهارس (تبدأ من 0) ضمن 1..count"""
+    indexes = []
+    for part in text.replace(' ', '').split(','):
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        first, last = int(start), int(end or start)
+        if first > last:
+            first, last = last, first
+        if first < 1 or last > count:
+            raise ValueError(f"النطاق {part} خارج 1..{count}")
+        indexes.extend(range(first - 1, last))
+    return list(dict.fromkeys(indexes))
+
+
+class FileIndex:
+    """فهرس دائم لملفات شجرة المجلدات في SQLite للبحث الشامل السريع
+
+    البناء والتحديث يجريان في خيط خلفي باتصال SQLite خاص به، والاستعلامات من خيط
+    فحص المستكشف تقرأ ما فُهرس حتى الآن (وضع WAL يسمح بالقراءة أثناء الكتابة).
+    المجلد الذي لم يتغير وقت تعديله منذ آخر فهرسة لا يُعاد قراءة محتواه، وتُحدّث فقط
+    أحجام ملفاته المفهرسة وأوقات تعديلها.
+    """
+    
+    SORT_COLUMNS = {'name': 'name', 'size': 'size', 'date': 'mtime'}
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = self.connect(check_same_thread=False)  # الاستعلامات متتالية من خيط واحد في كل مرة
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='file-index')
+        self.future: Optional[Future] = None
+        self.generation = 0  # يزيد مع كل دفعة مكتوبة لإبطال نتائج العرض المخزنة
+        self.stopping = threading.Event()
+    
+    def connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                extension TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS files_dir ON files (dir)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_extension ON files (extension)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent)")
+        conn.commit()
+        return conn
+    
+    @property
+    def building(self) -> bool:
+        return self.future is not None and not self.future.done()
+    
+    def refresh(self, root: str) -> Future:
+        """تحديث فهرس المجلد في الخلفية (لا يبدأ تحديث جديد أثناء تحديث جارٍ)"""
+        if not self.building:
+            self.future = self.executor.submit(self.index_tree, os.path.abspath(root))
+        return self.future
+    
+    def close(self):
+        """إيقاف الفهرسة الجارية (ما كُتب حتى الآن يبقى وتُكمل الفهرسة التالية الباقي)"""
+        self.stopping.set()
+        self.executor.shutdown(wait=False)
+    
+    @staticmethod
+    def remove_tree(conn: sqlite3.Connection, path: str):
+        """حذف مجلد وكل ما تحته من الفهرس"""
+        bounds = (path, path + '/', path + '0')
+        conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", bounds)
+        conn.execute("DELETE FROM files WHERE dir = ? OR (path >= ? AND path < ?)", bounds)
+    
+    @staticmethod
+    def restat_files(conn: sqlite3.Connection, directory: str):
+        """تحديث حجم ووقت تعديل ملفات مجلد لم تتغير قائمته"""
+        updates = []
+        removed = []
+        for path, size, mtime in conn.execute("SELECT path, size, mtime FROM files WHERE dir = ?", (directory,)).fetchall():
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                removed.append((path,))
+                continue
+            if file_stat.st_size != size or file_stat.st_mtime != mtime:
+                updates.append((file_stat.st_size, file_stat.st_mtime, path))
+        if updates:
+            conn.executemany("UPDATE files SET size = ?, mtime = ? WHERE path = ?", updates)
+        if removed:
+            conn.executemany("DELETE FROM files WHERE path = ?", removed)
+    
+    def index_tree(self, root: str, commit_every: int = 200) -> int:
+        """فهرسة الشجرة وإعادة عدد المجلدات التي أعيدت قراءتها"""
+        conn = self.connect()
+        changed = 0
+        try:
+            stack = [root]
+            while stack and not self.stopping.is_set():
+                directory = stack.pop()
+                try:
+                    dir_mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    self.remove_tree(conn, directory)
+                    continue
+                
+                known = conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (directory,)).fetchone()
+                children = [path for (path,) in conn.execute("SELECT path FROM dirs WHERE parent = ?", (directory,))]
+                if known and known[0] == dir_mtime:
+                    # قائمة الملفات لم تتغير، لكن ملفاً قد يُعاد كتابته أو يكبر في مكانه
+                    self.restat_files(conn, directory)
+                    stack.extend(children)
+                    continue
+                
+                files = []
+                subdirs = []
+                try:
+                    with os.scandir(directory) as iterator:
+                        for entry in iterator:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    subdirs.append(entry.path)
+                                    continue
+                                if not entry.is_file():
+                                    continue
+                                entry_stat = entry.stat()
+                            except OSError:
+                                continue
+                            files.append((
+                                entry.path, directory, entry.name.lower(), entry_stat.st_size,
+                                entry_stat.st_mtime, os.path.splitext(entry.name)[1].lower()
+                            ))
+                except OSError:
+                    continue
+                
+                for gone in set(children) - set(subdirs):
+                    self.remove_tree(conn, gone)
+                conn.execute("DELETE FROM files WHERE dir = ?", (directory,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, dir, name, size, mtime, extension) VALUES (?, ?, ?, ?, ?, ?)",
+                    files
+                )
+                # المجلدات الفرعية تُسجل بوقت تعديل غير صالح حتى تُزار، فلا تضيع إن توقفت الفهرسة
+                conn.executemany(
+                    "INSERT OR IGNORE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, -1)",
+                    [(subdir, directory) for subdir in subdirs]
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                    (directory, os.path.dirname(directory), dir_mtime)
+                )
+                stack.extend(subdirs)
+                
+                changed += 1
+                if changed % commit_every == 0:
+                    conn.commit()
+                    self.generation += 1
+            
+            conn.commit()
+            self.generation += 1
+            return changed
+        finally:
+            conn.close()
+    
+    def search(self, root: str, name_pattern: str = '', extensions: Optional[Iterable[str]] = None,
+               min_size: Optional[int] = None, max_size: Optional[int] = None,
+               sort_by: str = 'name', descending: bool = False,
+               limit: int = 5000) -> List[Dict[str, Any]]:
+        """البحث في الملفات تحت root
+
+        النمط الذي يحوي * أو ? أو [ يُطابق كـ glob على الاسم، وإلا كجزء من الاسم.
+        الترتيب (name, size, date) يجري في SQL قبل LIMIT، فأول limit نتيجة هي الأولى فعلاً بهذا الترتيب.
+        """
+        root = os.path.abspath(root).rstrip('/')
+        sql = "SELECT path, size, mtime, extension FROM files WHERE path >= ? AND path < ?"
+        params: List[Any] = [root + '/', root + '0']
+        if name_pattern:
+            pattern = name_pattern.lower()
+            if any(char in pattern for char in '*?['):
+                sql += " AND name GLOB ?"
+                params.append(pattern)
+            else:
+                escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                sql += " AND name LIKE ? ESCAPE '\\'"
+                params.append(f"%{escaped}%")
+        if extensions is not None:
+            extensions = list(extensions)
+            sql += f" AND extension IN ({', '.join('?' * len(extensions))})"
+            params.extend(extensions)
+        if min_size is not None:
+            sql += " AND size >= ?"
+            params.append(min_size)
+        if max_size is not None:
+            sql += " AND size <= ?"
+            params.append(max_size)
+        column = self.SORT_COLUMNS.get(sort_by, 'name')
+        direction = 'DESC' if descending else 'ASC'
+        sql += f" ORDER BY {column} {direction}, path {direction} LIMIT ?"
+        params.append(limit)
+        
+        return [
+            {'path': path, 'name': os.path.basename(path), 'size': size, 'date': mtime, 'extension': extension}
+            for path, size, mtime, extension in self.conn.execute(sql, params)
+        ]
+
+
+def parse_search_query(text: str) -> Dict[str, Any]:
+    """تحليل استعلام بحث شامل مثل "*.mkv >1gb video"
+
+    >حجم و<حجم لحدود الحجم، واسم نوع (video, audio...) للتصفية، والباقي نمط الاسم.
+    """
+    query = {'name': '', 'filter_type': None, 'min_size': None, 'max_size': None}
+    name_parts = []
+    for token in text.split():
+        if token[0] in '<>' and len(token) > 1:
+            size = parse_size(token.lstrip('<>='))
+            query['min_size' if token[0] == '>' else 'max_size'] = size
+        elif token in FILTER_EXTENSIONS:
+            query['filter_type'] = token
+        else:
+            name_parts.append(token)
+    query['name'] = ' '.join(name_parts)
+    return query
+
+
+class UploadStore:
+    """مخزن دائم لقائمة الرفع باستخدام SQLite في وضع WAL
+
+    تحديثات الحالة تُجمع في الذاكرة وتُكتب دفعة واحدة حتى لا تبطئ حلقة الرفع.
+    """
+    
+    def __init__(self, db_path: str, flush_interval: float = 2.0, flush_batch: int = 50):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                path TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (path, chat_id)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                fingerprint TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                media_type TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (fingerprint, chat_id)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS media_info (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                info TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.pending_updates = []
+        self.last_flush = time.monotonic()
+    
+    def enqueue(self, files: List[Dict[str, Any]], chat_id: str):
+        """إضافة ملفات إلى القائمة بحالة pending"""
+        now = time.time()
+        self.conn.executemany(
+            """
+            INSERT INTO jobs (path, chat_id, size, mtime, status, error, updated_at)
+            VALUES (?, ?, ?, ?, 'pending', NULL, ?)
+            ON CONFLICT (path, chat_id) DO UPDATE SET
+                size = excluded.size,
+                mtime = excluded.mtime,
+                status = 'pending',
+                error = NULL,
+                updated_at = excluded.updated_at
+            """,
+            [(f['path'], str(chat_id), f['size'], f.get('date', 0), now) for f in files]
+        )
+        self.conn.commit()
+    
+    def mark(self, path: str, chat_id: str, status: str, error: Optional[str] = None):
+        """تسجيل حالة ملف (تُكتب لاحقاً على دفعات)"""
+        self.pending_updates.append((status, error, time.time(), path, str(chat_id)))
+        if (len(self.pending_updates) >= self.flush_batch
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+    
+    def flush(self):
+        """كتابة تحديثات الحالة المتراكمة"""
+        if self.pending_updates:
+            self.conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE path = ? AND chat_id = ?",
+                self.pending_updates
+            )
+            self.conn.commit()
+            self.pending_updates = []
+        self.last_flush = time.monotonic()
+    
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """الملفات التي لم يكتمل رفعها في جلسة سابقة"""
+        self.flush()
+        rows = self.conn.execute(
+            "SELECT path, chat_id, size, mtime FROM jobs WHERE status = 'pending' ORDER BY rowid"
+        ).fetchall()
+        return [{'path': path, 'chat_id': chat_id, 'size': size, 'mtime': mtime} for path, chat_id, size, mtime in rows]
+    
+    def find_upload(self, fingerprint: str, chat_id: Optional[str] = None) -> Optional[Tuple[str, str, str]]:
+        """البحث عن رفع سابق بنفس البصمة (في قناة محددة أو أي قناة)
+
+        يعيد (chat_id, file_id, media_type) أو None.
+        """
+        if chat_id is not None:
+            row = self.conn.execute(
+                "SELECT chat_id, file_id, media_type FROM uploads WHERE fingerprint = ? AND chat_id = ?",
+                (fingerprint, str(chat_id))
+            ).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT chat_id, file_id, media_type FROM uploads WHERE fingerprint = ? ORDER BY updated_at DESC LIMIT 1",
+                (fingerprint,)
+            ).fetchone()
+        return tuple(row) if row else None
+    
+    def record_upload(self, fingerprint: str, chat_id: str, file_id: str, media_type: str):
+        """حفظ file_id الناتج عن رفع ناجح"""
+        self.conn.execute(
+            """
+            INSERT INTO uploads (fingerprint, chat_id, file_id, media_type, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (fingerprint, chat_id) DO UPDATE SET
+                file_id = excluded.file_id,
+                media_type = excluded.media_type,
+                updated_at = excluded.updated_at
+            """,
+            (fingerprint, str(chat_id), file_id, media_type, time.time())
+        )
+        self.conn.commit()
+    
+    def get_media_info(self, path: str, size: int, mtime: float) -> Optional[Dict[str, Any]]:
+        """معلومات الوسائط المحفوظة إن لم يتغير الملف"""
+        row = self.conn.execute(
+            "SELECT info FROM media_info WHERE path = ? AND size = ? AND mtime = ?",
+            (path, size, mtime)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def save_media_info(self, entries: List[Tuple[str, int, float, Dict[str, Any]]]):
+        """حفظ معلومات وسائط عدة ملفات دفعة واحدة"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO media_info (path, size, mtime, info) VALUES (?, ?, ?, ?)",
+            [(path, size, mtime, json.dumps(info)) for path, size, mtime, info in entries]
+        )
+        self.conn.commit()
+    
+    def cancel_pending(self, files: List[Dict[str, Any]], chat_ids: List[str]):
+        """إلغاء ملفات مهمة لم يكتمل رفعها (المكتملة والفاشلة تبقى كما هي)"""
+        self.flush()
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE path = ? AND chat_id = ? AND status = 'pending'",
+            [(now, f['path'], str(chat_id)) for f in files for chat_id in chat_ids]
+        )
+        self.conn.commit()
+    
+    def discard_unfinished(self):
+        """إلغاء الملفات غير المكتملة"""
+        self.flush()
+        self.conn.execute(
+            "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE status = 'pending'",
+            (time.time(),)
+        )
+        self.conn.commit()
+
+
+class ProgressReader:
+    """غلاف لملف يعد البايتات أثناء قراءتها من طبقة HTTP"""
+    
+    def __init__(self, file: Any, on_read: Callable[[int], None]):
+        self.file = file
+        self.on_read = on_read
+    
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.file.read(size)
+        if chunk:
+            self.on_read(len(chunk))
+        return chunk
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.file, name)
+
+
+class FileSlice:
+    """نافذة قراءة على جزء من ملف (offset، length) تحسب SHA-256 أثناء القراءة
+
+    أجزاء الملفات الكبيرة تُرفع منها مباشرة دون نسخها إلى ملفات مؤقتة. البصمة تُحدّث
+    فقط عند القراءة المتتابعة من آخر موضع محسوب، فإعادة القراءة بعد seek لا تفسدها.
+    """
+    
+    def __init__(self, file_path: str, offset: int, length: int):
+        self.file = open(file_path, 'rb')
+        self.name = file_path
+        self.offset = offset
+        self.length = length
+        self.position = 0
+        self.digest = hashlib.sha256()
+        self.hashed = 0
+    
+    def read(self, size: int = -1) -> bytes:
+        remaining = self.length - self.position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b''
+        self.file.seek(self.offset + self.position)
+        chunk = self.file.read(size)
+        if self.position == self.hashed:
+            self.digest.update(chunk)
+            self.hashed += len(chunk)
+        self.position += len(chunk)
+        return chunk
+    
+    def seek(self, position: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            position += self.position
+        elif whence == os.SEEK_END:
+            position += self.length
+        self.position = min(max(position, 0), self.length)
+        return self.position
+    
+    def tell(self) -> int:
+        return self.position
+    
+    @property
+    def sha256(self) -> Optional[str]:
+        """بصمة الجزء إن قُرئ كاملاً"""
+        return self.digest.hexdigest() if self.hashed == self.length else None
+    
+    def close(self):
+        self.file.close()
+    
+    def __enter__(self) -> 'FileSlice':
+        return self
+    
+    def __exit__(self, *exc_info: Any):
+        self.close()
+
+
+class ProgressRequestData:
+    """غلاف لبيانات الطلب يستبدل محتوى الملفات بقارئ يعد البايتات"""
+    
+    def __init__(self, request_data: Any, on_read: Callable[[int], None]):
+        self.request_data = request_data
+        self.on_read = on_read
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.request_data, name)
+    
+    @property
+    def multipart_data(self) -> Dict[str, Any]:
+        wrapped = {}
+        for name, (filename, content, *rest) in self.request_data.multipart_data.items():
+            if isinstance(content, bytes):
+                content = io.BytesIO(content)
+            wrapped[name] = (filename, ProgressReader(content, self.on_read), *rest)
+        return wrapped
+
+
+class ProgressHTTPXRequest(HTTPXRequest):
+    """طبقة طلبات تتيح متابعة البايتات المرسلة فعلياً أثناء رفع الملفات"""
+    
+    async def do_request(self, url: str, method: str, request_data: Any = None, **kwargs: Any):
+        on_read = UPLOAD_PROGRESS.get()
+        if on_read is not None and request_data is not None and request_data.contains_files:
+            request_data = ProgressRequestData(request_data, on_read)
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+class UploadProgress:
+    """متابعة تقدم دفعة رفع: البايتات المنقولة والسرعة والوقت المتبقي
+
+    الرسم يتم عبر on_render بحد أقصى مرة كل refresh_interval ثانية.
+    """
+    
+    def __init__(self, total_files: int, total_bytes: int, on_render: Callable[['UploadProgress'], None],
+                 refresh_interval: float = PROGRESS_REFRESH_INTERVAL):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.on_render = on_render
+        self.refresh_interval = refresh_interval
+        self.active = {}  # المفتاح -> [الحجم، المرسل]
+        self.done_bytes = 0
+        self.transferred_bytes = 0
+        self.completed_files = 0
+        self.failed_files = 0
+        self.retries = 0  # إعادات المحاولة داخل الطلبات (حد المعدل أو خطأ مؤقت)
+        self.retryable = set()  # ملفات كان آخر فشل لها خطأً مؤقتاً
+        self.started = time.monotonic()
+        self.last_render = 0.0
+        self.samples = deque([(self.started, 0)])
+    
+    def start_file(self, key: str, size: int):
+        self.active[key] = [size, 0]
+        self.maybe_render()
+    
+    def reset_file(self, key: str):
+        """تصفير عداد ملف عند إعادة محاولة رفعه"""
+        if key in self.active:
+            self.active[key][1] = 0
+    
+    def add_bytes(self, key: str, count: int):
+        self.transferred_bytes += count
+        if key in self.active:
+            self.active[key][1] += count
+        self.maybe_render()
+    
+    def end_file(self, key: str, size: int):
+        self.active.pop(key, None)
+        self.done_bytes += size
+        self.maybe_render()
+    
+    def file_completed(self, success: bool):
+        self.completed_files += 1
+        if not success:
+            self.failed_files += 1
+        self.maybe_render(force=True)
+    
+    def retry_file(self, key: str, size: int):
+        """إعادة ملف فاشل إلى العدادات قبل محاولة رفعه مجدداً"""
+        self.retryable.discard(key)
+        self.completed_files -= 1
+        self.failed_files -= 1
+        self.done_bytes -= size
+    
+    @property
+    def processed_bytes(self) -> int:
+        return self.done_bytes + sum(min(sent, size) for size, sent in self.active.values())
+    
+    @property
+    def average_speed(self) -> float:
+        """متوسط سرعة الدفعة منذ البداية (بايت/ثانية)"""
+        return self.transferred_bytes / max(time.monotonic() - self.started, 1e-6)
+    
+    @property
+    def current_speed(self) -> float:
+        """السرعة خلال آخر SPEED_WINDOW ثانية (بايت/ثانية)"""
+        first_time, first_bytes = self.samples[0]
+        elapsed = time.monotonic() - first_time
+        return (self.transferred_bytes - first_bytes) / elapsed if elapsed > 0 else 0.0
+    
+    @property
+    def eta(self) -> Optional[float]:
+        speed = self.current_speed or self.average_speed
+        if speed <= 0:
+            return None
+        return max(self.total_bytes - self.processed_bytes, 0) / speed
+    
+    def maybe_render(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.last_render < self.refresh_interval:
+            return
+        self.last_render = now
+        self.samples.append((now, self.transferred_bytes))
+        while len(self.samples) > 2 and now - self.samples[0][0] > SPEED_WINDOW:
+            self.samples.popleft()
+        self.on_render(self)
+
+
+class UploadJob:
+    """مهمة رفع في الخلفية: ملفات وقنوات مع حالتها وتقدمها
+
+    الإيقاف المؤقت يمنع بدء ملفات جديدة فقط، والملفات الجارية تكتمل.
+    المهمة الموقوفة تحرر عاملها لمهمة أخرى، وبعد استئنافها تنتظر عاملاً متاحاً لتكمل.
+    """
+    
+    def __init__(self, job_id: int, files: List[Dict[str, Any]], chat_ids: List[str],
+                 album_mode: bool = False, priority: int = 0):
+        self.id = job_id
+        self.files = files
+        self.chat_ids = chat_ids
+        self.album_mode = album_mode
+        self.priority = priority  # الأصغر يبدأ أولاً
+        self.status = 'queued'  # queued, running, done, failed, cancelled
+        self.total_size = sum(f['size'] for f in files)
+        self.progress: Optional[UploadProgress] = None
+        self.results: List[Tuple[bool, str]] = []
+        self.stats = {}
+        self.messages = deque(maxlen=50)  # آخر أسطر النتائج لعرضها في شاشة المهام
+        self.pause_requested = False
+        self.resumed = asyncio.Event()  # تبدأ الملفات الجديدة فقط عند ضبطه
+        self.resumed.set()
+        self.pause_signal = asyncio.Event()  # يوقظ العامل ليتحرر من المهمة عند إيقافها
+        self.detached = False  # جارية بلا عامل (أُوقفت فتحرر عاملها)
+        self.cancel_requested = False
+        self.task: Optional[asyncio.Task] = None
+    
+    @property
+    def paused(self) -> bool:
+        return self.pause_requested
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+    
+    @property
+    def failed_count(self) -> int:
+        return sum(1 for success, _ in self.results if not success)
+
+
+class UploadJobManager:
+    """طابور مهام الرفع في الخلفية مع أولويات
+
+    عمال asyncio يأخذون المهمة المنتظرة الأعلى أولوية (ثم الأقدم) وينفذونها عبر run_job،
+    فيستمر المستخدم في التصفح وإضافة مهام جديدة أثناء الرفع.
+    """
+    
+    def __init__(self, run_job: Callable[[UploadJob], Any], workers: int = 1):
+        self.run_job = run_job
+        self.workers = max(1, workers)
+        self.jobs: List[UploadJob] = []
+        self.next_id = 1
+        self.changed = asyncio.Event()
+        self.worker_tasks: List[asyncio.Task] = []
+    
+    def submit(self, files: List[Dict[str, Any]], chat_ids: List[str], album_mode: bool = False) -> UploadJob:
+        """إضافة مهمة إلى الطابور وتشغيل العمال عند أول استخدام"""
+        job = UploadJob(self.next_id, files, chat_ids, album_mode)
+        self.next_id += 1
+        self.jobs.append(job)
+        if not self.worker_tasks:
+            self.worker_tasks = [asyncio.ensure_future(self.worker()) for _ in range(self.workers)]
+        self.changed.set()
+        return job
+    
+    def get(self, job_id: int) -> Optional[UploadJob]:
+        return next((job for job in self.jobs if job.id == job_id), None)
+    
+    def next_job(self) -> Optional[UploadJob]:
+        waiting = [
+            job for job in self.jobs
+            if (job.status == 'queued' or (job.status == 'running' and job.detached)) and not job.paused
+        ]
+        return min(waiting, key=lambda job: (job.priority, job.id), default=None)
+    
+    async def worker(self):
+        while True:
+            job = self.next_job()
+            if job is None:
+                self.changed.clear()
+                await self.changed.wait()
+                continue
+            
+            if job.status == 'running':
+                # مهمة استؤنفت بعد أن حررت عاملها
+                job.detached = False
+                job.resumed.set()
+            else:
+                job.status = 'running'
+                job.task = asyncio.ensure_future(self.execute(job))
+            
+            # العامل يبقى مع المهمة حتى تنتهي أو تُوقف مؤقتاً
+            signal = None
+            try:
+                while not job.task.done() and not job.paused:
+                    job.pause_signal.clear()
+                    signal = asyncio.ensure_future(job.pause_signal.wait())
+                    await asyncio.wait([job.task, signal], return_when=asyncio.FIRST_COMPLETED)
+                    signal.cancel()
+            except asyncio.CancelledError:
+                job.task.cancel()
+                if signal is not None:
+                    signal.cancel()
+                raise
+            if not job.task.done():
+                job.detached = True
+    
+    async def execute(self, job: UploadJob):
+        CURRENT_JOB.set(job)
+        try:
+            await self.run_job(job)
+            job.status = 'failed' if job.failed_count else 'done'
+        except asyncio.CancelledError:
+            job.status = 'cancelled' if job.cancel_requested else 'queued'
+            raise
+        except Exception as e:
+            logger.exception(f"فشلت مهمة الرفع #{job.id}")
+            job.messages.append(f"{Colors.FAIL}❌ {e}{Colors.ENDC}")
+            job.status = 'failed'
+    
+    def pause(self, job: UploadJob):
+        job.pause_requested = True
+        job.resumed.clear()
+        job.pause_signal.set()
+    
+    def resume(self, job: UploadJob):
+        job.pause_requested = False
+        if not job.detached:
+            job.resumed.set()
+        self.changed.set()
+    
+    def cancel(self, job: UploadJob):
+        """إلغاء مهمة منتظرة أو جارية (الملفات المكتملة تبقى مرفوعة)"""
+        job.cancel_requested = True
+        if job.status == 'running' and job.task is not None:
+            job.task.cancel()
+        elif job.status == 'queued':
+            job.status = 'cancelled'
+    
+    def set_priority(self, job: UploadJob, priority: int):
+        job.priority = priority
+        self.changed.set()
+    
+    def clear_finished(self) -> int:
+        before = len(self.jobs)
+        self.jobs = [job for job in self.jobs if not job.finished]
+        return before - len(self.jobs)
+    
+    def counts(self) -> Dict[str, int]:
+        """عدد المهام النشطة والمنتظرة والموقوفة والفاشلة"""
+        counts = {'active': 0, 'queued': 0, 'paused': 0, 'failed': 0}
+        for job in self.jobs:
+            if job.status in ('running', 'queued') and job.paused:
+                counts['paused'] += 1
+            elif job.status == 'running':
+                counts['active'] += 1
+            elif job.status == 'queued':
+                counts['queued'] += 1
+            elif job.status == 'failed':
+                counts['failed'] += 1
+        return counts
+    
+    @property
+    def busy(self) -> bool:
+        return any(not job.finished for job in self.jobs)
+    
+    async def shutdown(self):
+        """إيقاف العمال والمهام الجارية (ملفاتها تبقى pending لتُعرض للاستئناف لاحقاً)"""
+        for task in self.worker_tasks:
+            task.cancel()
+        running = [job.task for job in self.jobs if job.status == 'running' and job.task is not None]
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, *running, return_exceptions=True)
+        self.worker_tasks = []
+
+
+class FolderWatcher:
+    """مراقبة مجلد واكتشاف الملفات الجديدة بعد اكتمال كتابتها
+
+    تستخدم inotify عند توفره (inotify_simple) وإلا تعيد فحص المجلد دورياً.
+    الملف يُعتبر جاهزاً عندما يبقى حجمه ووقت تعديله دون تغيير لمدة stable_seconds.
+    """
+    
+    # بلا MODIFY: يتكرر مع كل كتابة لملف يُسجل، وفحص الاستقرار يكفي لمعرفة اكتماله
+    WATCH_FLAGS = 0
+    if inotify_simple is not None:
+        WATCH_FLAGS = (inotify_simple.flags.CLOSE_WRITE | inotify_simple.flags.MOVED_TO
+                       | inotify_simple.flags.CREATE)
+    
+    def __init__(self, directory: str, recursive: bool = False, stable_seconds: float = 5.0,
+                 poll_interval: float = 2.0):
+        self.directory = os.path.abspath(directory)
+        self.recursive = recursive
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self.known = {}  # المسار -> (الحجم، وقت التعديل) للملفات التي عولجت
+        self.candidates = {}  # المسار -> (الحجم، وقت التعديل، منذ متى لم يتغير)
+        self.inotify = None
+        self.watch_dirs = {}
+        self.last_poll = 0.0
+    
+    @property
+    def backend(self) -> str:
+        return 'inotify' if self.inotify is not None else 'polling'
+    
+    def snapshot(self) -> Dict[str, Tuple[int, float]]:
+        """حالة ملفات المجلد الحالية"""
+        files = {}
+        pending_dirs = [self.directory]
+        while pending_dirs:
+            current = pending_dirs.pop()
+            try:
+                with os.scandir(current) as iterator:
+                    for entry in iterator:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if self.recursive:
+                                    pending_dirs.append(entry.path)
+                            elif entry.is_file():
+                                entry_stat = entry.stat()
+                                files[entry.path] = (entry_stat.st_size, entry_stat.st_mtime)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return files
+    
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """تسجيل الملفات الموجودة حالياً وتفعيل inotify إن أمكن"""
+        self.known = self.snapshot()
+        if inotify_simple is None:
+            return
+        try:
+            self.inotify = inotify_simple.INotify()
+            self.add_watch(self.directory)
+            if self.recursive:
+                for dirpath, dirnames, _ in os.walk(self.directory):
+                    for dirname in dirnames:
+                        self.add_watch(os.path.join(dirpath, dirname))
+            loop.add_reader(self.inotify.fileno(), self.read_events)
+        except OSError as e:
+            logger.warning(f"تعذر تفعيل inotify، سيتم الاستطلاع الدوري: {e}")
+            self.inotify = None
+    
+    def add_watch(self, path: str):
+        wd = self.inotify.add_watch(path, self.WATCH_FLAGS)
+        self.watch_dirs[wd] = path
+    
+    def stop(self, loop: asyncio.AbstractEventLoop):
+        if self.inotify is not None:
+            loop.remove_reader(self.inotify.fileno())
+            self.inotify.close()
+            self.inotify = None
+    
+    def read_events(self):
+        """معالجة أحداث inotify: كل ملف تغير يصبح مرشحاً لفحص الاستقرار"""
+        for event in self.inotify.read(timeout=0):
+            parent = self.watch_dirs.get(event.wd)
+            if parent is None or not event.name:
+                continue
+            path = os.path.join(parent, event.name)
+            if event.mask & inotify_simple.flags.ISDIR:
+                if self.recursive and event.mask & (inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO):
+                    try:
+                        self.add_watch(path)
+                    except OSError:
+                        continue
+                    # الملفات التي كُتبت قبل إضافة المراقبة
+                    for dirpath, _, filenames in os.walk(path):
+                        for filename in filenames:
+                            self.add_candidate(os.path.join(dirpath, filename))
+                continue
+            self.add_candidate(path)
+    
+    def add_candidate(self, path: str):
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return
+        current = (file_stat.st_size, file_stat.st_mtime)
+        if self.known.get(path) == current:
+            return
+        previous = self.candidates.get(path)
+        if previous is None or previous[:2] != current:
+            self.candidates[path] = (*current, time.monotonic())
+    
+    def collect_ready(self) -> List[str]:
+        """الملفات المرشحة التي استقر حجمها"""
+        now = time.monotonic()
+        if self.inotify is None and now - self.last_poll >= self.poll_interval:
+            self.last_poll = now
+            for path in self.snapshot():
+                self.add_candidate(path)
+        
+        ready = []
+        for path, (size, mtime, since) in list(self.candidates.items()):
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                del self.candidates[path]
+                continue
+            current = (file_stat.st_size, file_stat.st_mtime)
+            if current != (size, mtime):
+                self.candidates[path] = (*current, now)
+            elif now - since >= self.stable_seconds:
+                del self.candidates[path]
+                self.known[path] = current
+                ready.append(path)
+        return sorted(ready)
+    
+    async def ready_files(self, debounce: float = 1.0):
+        """مولّد غير متزامن يعيد دفعات الملفات الجاهزة للرفع"""
+        while True:
+            ready = self.collect_ready()
+            if ready:
+                yield ready
+            await asyncio.sleep(debounce)
+
+
 class TelegramVideoUploader:
     def __init__(self, bot_token: str):
-        self.bot = Bot(token=bot_token)
+        self.config = self.load_config()
+        self.local_mode = bool(self.config.get('local_mode', False))
+        base_url = self.config.get('api_base_url') or ''
+        if self.local_mode and (not base_url or 'api.telegram.org' in base_url):
+            # مسارات file:// لا يفهمها إلا خادم Bot API محلي يعمل بـ --local
+            logger.error("local_mode يتطلب api_base_url لخادم Bot API محلي، سيُستخدم الرفع العادي")
+            self.local_mode = False
+        self.max_video_size = MAX_FILE_SIZE if self.local_mode else MAX_VIDEO_SIZE
+        self.bot = self.create_bot(bot_token)
+        self.headless = False
         self.current_path = os.getcwd()
-        self.selected_files = []
+        self.selected_files = SelectionSet()
         self.last_channels = []
+        self.registry_refresh = None
         self.search_query = ""
+        self.recursive_search = None  # استعلام البحث الشامل ومجلده الجذر
+        self.file_index = FileIndex(os.path.expanduser("~/.telegram_uploader_index.db"))
         self.filter_type = None
         self.sort_by = "name"  # name, size, date
         self.sort_reverse = False
+        self.dir_cache = {}
+        self.view_cache = None
+        self.folder_sizes = {}
+        self.folder_size_futures = {}
+        self.size_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='folder-size')
+        # فحص المجلدات خارج حلقة الأحداث حتى تستمر الرفعات أثناء التصفح (خيط واحد يكفي لتسلسل الفحص)
+        self.scan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scan')
         self.bookmarks = []
         self.upload_history = []
-        self.config = self.load_config()
+        self.sent_media = {}
+        global_rate = float(self.config.get('global_rate_limit', 30))
+        self.global_limiter = TokenBucket(global_rate, global_rate)
+        self.chat_limiters = {}
+        self.store = UploadStore(os.path.expanduser("~/.telegram_uploader_queue.db"))
+        self.upload_slots = asyncio.Semaphore(max(1, int(self.config.get('upload_workers', 3))))
+        self.job_manager = UploadJobManager(self.run_upload_job, int(self.config.get('job_workers', 1)))
+        # كل عملية ffmpeg متعددة الخيوط بنفسها، لذا يكفي خيط واحد لمراقبة كل عملية
+        transcode_workers = self.config.get('transcode_workers') or max(1, (os.cpu_count() or 2) // 2)
+        self.transcode_executor = ThreadPoolExecutor(max_workers=int(transcode_workers), thread_name_prefix='transcode')
+        self.transcodes_in_use = Counter()  # نسخ مضغوطة تنتظر الرفع فلا تُحذف من الذاكرة المؤقتة
+        self.probe_executor = ThreadPoolExecutor(max_workers=int(self.config.get('probe_workers', 4)), thread_name_prefix='probe')
+        self.media_info_cache = {}
+        self.sniffed_types = {}  # المسار -> (وقت التعديل، النوع) للملفات بلا امتداد
+        self.media_info_unsaved = []
+        self.media_info_lock = threading.Lock()  # تحمي media_info_unsaved من خيوط الفحص
+        self.probe_futures = {}
+        self.ffprobe_available = shutil.which('ffprobe') is not None
+        
+    def create_bot(self, bot_token: str) -> Bot:
+        """إنشاء عميل البوت مع دعم خادم Bot API مستضاف ذاتياً"""
+        bot_kwargs = {}
+        base_url = self.config.get('api_base_url')
+        if base_url:
+            base_url = base_url.rstrip('/')
+            bot_kwargs['base_url'] = base_url
+            base_file_url = self.config.get('api_base_file_url')
+            if not base_file_url and base_url.endswith('/bot'):
+                base_file_url = base_url[:-len('/bot')] + '/file/bot'
+            if base_file_url:
+                bot_kwargs['base_file_url'] = base_file_url
+        
+        return Bot(token=bot_token, request=self.create_request(), local_mode=self.local_mode, **bot_kwargs)
+    
+    def create_request(self) -> 'ProgressHTTPXRequest':
+        """إنشاء طبقة HTTP مشتركة بحجم مجمّع اتصالات يناسب عدد الرفعات المتوازية
         
+        كل رفعة تشغل اتصالاً طوال مدتها، ويضاف هامش لإعادة الإرسال عبر file_id وطلبات القنوات
+        حتى لا تنتظر الرفعات دورها على المجمّع بدل أن تعمل بالتوازي.
+        """
+        workers = max(1, int(self.config.get('upload_workers', 3)))
+        pool_size = int(self.config.get('connection_pool_size') or workers * 2 + 4)
+        timeout = float(self.config.get('request_timeout', 30))
+        http_version = '2' if self.config.get('http2', True) and HTTP2_AVAILABLE else '1.1'
+        return ProgressHTTPXRequest(
+            connection_pool_size=pool_size,
+            read_timeout=timeout,
+            write_timeout=timeout,
+            connect_timeout=timeout,
+            pool_timeout=timeout,
+            http_version=http_version,
+            httpx_kwargs={
+                'limits': httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=KEEPALIVE_EXPIRY
+                )
+            }
+        )
+    
+    def request_timeouts(self, upload_size: int = 0) -> Dict[str, float]:
+        """مهل الطلب محسوبة من حجم الملف المرفوع
+        
+        مهلة الكتابة تكفي لرفع الملف بأدنى سرعة مقبولة، ومهلة القراءة تشمل معالجة الخادم له،
+        فلا تنقطع رفعات 2GB بينما تفشل الطلبات الصغيرة بسرعة.
+        """
+        timeout = float(self.config.get('request_timeout', 30))
+        min_speed = max(1, parse_size(str(self.config.get('min_upload_speed', '256KB'))))
+        return {
+            'read_timeout': timeout + upload_size / SERVER_PROCESS_SPEED,
+            'write_timeout': timeout + upload_size / min_speed,
+            'connect_timeout': timeout,
+            'pool_timeout': timeout
+        }
+    
     def load_config(self) -> Dict[str, Any]:
         """تحميل الإعدادات من ملف"""
         config_path = os.path.expanduser("~/.telegram_uploader_config.json")
         default_config = {
             "default_upload_type": "auto",  # auto, video, document
+            "album_mode": False,  # تجميع الملفات المتوافقة في ألبومات (حتى 10 في الطلب)
             "default_caption": "📦 {filename}\n💾 الحجم: {size}",
             "auto_compress": False,
             "compress_quality": 28,
+            "transcode_workers": None,  # الافتراضي: نصف عدد الأنوية
+            "transcode_cache_mb": 4096,
+            "probe_workers": 4,
+            "channel_registry_ttl": 3600,  # ثوانٍ قبل إعادة التحقق من صلاحيات البوت
+            "watch_stable_seconds": 5,
+            "watch_poll_interval": 2,
+            "thumbnails": True,
+            "thumbnail_cache_mb": 200,
             "split_large_files": True,
             "split_size": "1.5GB",
-            "upload_delay": 2,
+            "global_rate_limit": 30,  # طلب في الثانية لكل البوت
+            "chat_rate_limit": 20,  # أقصى طلب في الدقيقة لكل قناة (يُخفض تلقائياً عند RetryAfter)
+            "flood_retries": 5,
+            "network_retries": 3,  # إعادة المحاولة عند انقطاع الشبكة أو انتهاء المهلة
+            "retry_backoff": 1.0,  # ثوانٍ، تتضاعف مع كل محاولة
+            "retry_backoff_max": 30.0,
+            "dedup_mode": "skip",  # skip, resend, off
+            "dedup_full_hash": False,
+            "upload_workers": 3,
+            "job_workers": 1,  # مهام الرفع الخلفية التي تعمل في نفس الوقت
+            "connection_pool_size": None,  # الافتراضي: ضعف عدد الرفعات المتوازية + 4
+            "http2": True,  # يُستخدم فقط إن كانت مكتبة h2 مثبتة
+            "request_timeout": 30,
+            "min_upload_speed": "256KB",  # لكل ثانية، لحساب مهلة رفع الملفات الكبيرة
+            "api_base_url": None,  # مثال: http://localhost:8081/bot لخادم Bot API محلي
+            "api_base_file_url": None,
+            "local_mode": False,  # رفع الملفات بمسارها مباشرة عبر خادم محلي يعمل بـ --local
             "theme": "default"
         }
         
@@ -103,6 +1560,40 @@ class TelegramVideoUploader:
         """مسح الشاشة"""
         os.system('clear' if os.name == 'posix' else 'cls')
     
+    async def ask(self, prompt: str) -> str:
+        """قراءة سطر من المستخدم دون إيقاف حلقة الأحداث
+
+        القراءة تجري في خيط daemon حتى لا يمنع سطرٌ معلق إغلاق البرنامج، وتستمر الرفعات
+        والمهام الخلفية في التقدم أثناء انتظار المستخدم.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def settle(result: Any, error: Optional[BaseException]):
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        
+        def read():
+            try:
+                result, error = input(prompt), None
+            except BaseException as e:
+                result, error = None, e
+            try:
+                loop.call_soon_threadsafe(settle, result, error)
+            except RuntimeError:
+                pass  # حلقة الأحداث أُغلقت أثناء الانتظار
+        
+        threading.Thread(target=read, name='prompt', daemon=True).start()
+        return await future
+    
+    async def pause(self):
+        """انتظار ضغط Enter للمتابعة"""
+        await self.ask(f"\n{Colors.GREEN}⏎ اضغط Enter للمتابعة...{Colors.ENDC}")
+    
     def print_header(self, title: str, subtitle: str = ""):
         """طباعة عنوان مع تزيين متقدم"""
         self.clear_screen()
@@ -122,95 +1613,259 @@ class TelegramVideoUploader:
     def print_status_bar(self):
         """عرض شريط الحالة"""
         selected_count = len(self.selected_files)
-        selected_size = sum(f['size'] for f in self.selected_files)
+        selected_size = self.selected_files.total_size
         current_time = datetime.now().strftime("%H:%M:%S")
         
         status = f"📊 مختار: {selected_count} ملف ({self.format_size(selected_size)}) | 🕒 {current_time}"
         if self.search_query:
             status += f" | 🔍 بحث: '{self.search_query}'"
+        if self.recursive_search:
+            status += f" | 🔎 بحث شامل: '{self.recursive_search['text']}'"
+            if self.file_index.building:
+                status += " (⏳ جاري الفهرسة)"
         if self.filter_type:
             status += f" | 🎯 تصفية: {self.filter_type}"
         
         print(f"{Colors.GREEN}{status}{Colors.ENDC}")
+        if self.job_manager.jobs:
+            print(f"{Colors.CYAN}{self.jobs_status_line()}{Colors.ENDC}")
         print(f"{Colors.BLUE}{'-' * 80}{Colors.ENDC}")
     
-    async def get_bot_channels(self) -> List[Dict[str, Any]]:
-        """الحصول على القنوات والجروبات التي البوت إدمن فيها"""
-        if self.last_channels:
-            return self.last_channels
-            
+    def jobs_status_line(self) -> str:
+        """سطر مختصر لحالة مهام الرفع في الخلفية"""
+        counts = self.job_manager.counts()
+        line = f"📤 مهام: {counts['active']} نشطة"
+        running = [job.progress for job in self.job_manager.jobs
+                   if job.status == 'running' and job.progress is not None]
+        if running:
+            done = sum(progress.processed_bytes for progress in running)
+            total = sum(progress.total_bytes for progress in running)
+            speed = sum(progress.current_speed for progress in running)
+            percent = min(done / total * 100, 100) if total else 100
+            line += f" ({percent:.0f}% ⚡ {self.format_size(int(speed))}/s)"
+        line += f" | ⏳ {counts['queued']} في الانتظار"
+        if counts['paused']:
+            line += f" | ⏸️ {counts['paused']} موقوفة"
+        if counts['failed']:
+            line += f" | ❌ {counts['failed']} فاشلة"
+        return line
+    
+    def load_channel_registry(self) -> Dict[str, Any]:
+        """تحميل سجل القنوات المحفوظ"""
+        registry = {'updated_at': 0, 'offset': None, 'channels': {}}
+        registry_path = os.path.expanduser("~/.telegram_uploader_channels.json")
+        try:
+            if os.path.exists(registry_path):
+                with open(registry_path, 'r', encoding='utf-8') as f:
+                    registry.update(json.load(f))
+        except Exception as e:
+            logger.error(f"خطأ في تحميل سجل القنوات: {e}")
+        return registry
+    
+    def save_channel_registry(self, registry: Dict[str, Any]):
+        """حفظ سجل القنوات"""
+        registry_path = os.path.expanduser("~/.telegram_uploader_channels.json")
         try:
-            bot_info = await self.bot.get_me()
+            with open(registry_path, 'w', encoding='utf-8') as f:
+                json.dump(registry, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f"خطأ في حفظ سجل القنوات: {e}")
+    
+    async def refresh_channel_registry(self, registry: Dict[str, Any], announce: bool = True):
+        """تحديث سجل القنوات تدريجياً من التحديثات الجديدة فقط
+
+        تحديثات my_chat_member تضيف أو تحذف القنوات مباشرة، والقنوات المكتشفة من
+        الرسائل أو التي انتهت صلاحية فحصها يُتحقق من صلاحيات البوت فيها بالتوازي.
+        """
+        bot_info = await self.bot.get_me()
+        if announce and not self.headless:
             print(f"{Colors.CYAN}🤖 البوت: {bot_info.first_name} (@{bot_info.username}){Colors.ENDC}")
-            
-            channels = []
-            updates = await self.bot.get_updates(limit=100)
-            
+        
+        channels = registry['channels']
+        to_check = {}
+        now = time.time()
+        ttl = float(self.config.get('channel_registry_ttl', 3600))
+        
+        while True:
+            updates = await self.bot.get_updates(
+                offset=registry['offset'],
+                limit=100,
+                timeout=0,
+                allowed_updates=['message', 'channel_post', 'my_chat_member']
+            )
             for update in updates:
-                if update.message and update.message.chat:
-                    chat = update.message.chat
-                    if chat.type in ['group', 'supergroup', 'channel']:
-                        try:
-                            chat_member = await self.bot.get_chat_member(chat.id, bot_info.id)
-                            if chat_member.status in ['administrator', 'creator']:
-                                channels.append({
-                                    'id': chat.id,
-                                    'title': chat.title,
-                                    'type': chat.type,
-                                    'username': getattr(chat, 'username', None)
-                                })
-                        except Exception:
-                            continue
-            
-            # إزالة المكررات
-            unique_channels = []
-            seen_ids = set()
-            for channel in channels:
-                if channel['id'] not in seen_ids:
-                    unique_channels.append(channel)
-                    seen_ids.add(channel['id'])
-            
-            self.last_channels = unique_channels
-            return unique_channels
-            
+                registry['offset'] = update.update_id + 1
+                if update.my_chat_member:
+                    chat = update.my_chat_member.chat
+                    if chat.type not in ['group', 'supergroup', 'channel']:
+                        continue
+                    if update.my_chat_member.new_chat_member.status in ['administrator', 'creator']:
+                        channels[str(chat.id)] = self.channel_entry(chat, now)
+                    else:
+                        channels.pop(str(chat.id), None)
+                        to_check.pop(str(chat.id), None)
+                    continue
+                
+                message = update.message or update.channel_post
+                if message and message.chat and message.chat.type in ['group', 'supergroup', 'channel']:
+                    if str(message.chat.id) not in channels:
+                        to_check[str(message.chat.id)] = message.chat
+            if len(updates) < 100:
+                break
+        
+        # القنوات المحفوظة التي مر على آخر فحص لها أكثر من المدة المحددة
+        for chat_id, channel in channels.items():
+            if now - channel.get('checked_at', 0) >= ttl and chat_id not in to_check:
+                to_check[chat_id] = None
+        
+        semaphore = asyncio.Semaphore(10)
+        
+        async def check(chat_id: str, chat: Any) -> Tuple[str, Optional[bool], Any]:
+            async with semaphore:
+                try:
+                    chat_member = await self.bot.get_chat_member(chat_id, bot_info.id)
+                    if chat is None:
+                        chat = await self.bot.get_chat(chat_id)
+                    return chat_id, chat_member.status in ['administrator', 'creator'], chat
+                except (BadRequest, Forbidden):
+                    return chat_id, False, chat
+                except Exception:
+                    # خطأ مؤقت: نُبقي الحالة كما هي
+                    return chat_id, None, chat
+        
+        results = await asyncio.gather(*(check(chat_id, chat) for chat_id, chat in to_check.items()))
+        for chat_id, is_admin, chat in results:
+            if is_admin:
+                channels[chat_id] = self.channel_entry(chat, now)
+            elif is_admin is False:
+                channels.pop(chat_id, None)
+        
+        registry['updated_at'] = now
+        self.save_channel_registry(registry)
+    
+    def channel_entry(self, chat: Any, checked_at: float) -> Dict[str, Any]:
+        """تحويل كائن المحادثة إلى عنصر في سجل القنوات"""
+        return {
+            'id': chat.id,
+            'title': chat.title,
+            'type': chat.type,
+            'username': getattr(chat, 'username', None),
+            'checked_at': checked_at
+        }
+    
+    async def get_bot_channels(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
+        """الحصول على القنوات والجروبات التي البوت إدمن فيها
+
+        تُعرض القنوات المحفوظة فوراً، ويُحدّث السجل في الخلفية عند انتهاء صلاحيته.
+        """
+        if self.last_channels and not force_refresh:
+            return self.last_channels
+        
+        registry = self.load_channel_registry()
+        ttl = float(self.config.get('channel_registry_ttl', 3600))
+        try:
+            if not registry['channels'] or force_refresh:
+                await self.refresh_channel_registry(registry)
+            elif time.time() - registry['updated_at'] >= ttl and self.registry_refresh is None:
+                self.registry_refresh = asyncio.create_task(self.refresh_registry_in_background(registry))
         except Exception as e:
             logger.error(f"خطأ في الحصول على القنوات: {e}")
-            return []
+        
+        self.last_channels = sorted(registry['channels'].values(), key=lambda c: (c['title'] or '').lower())
+        return self.last_channels
+    
+    async def refresh_registry_in_background(self, registry: Dict[str, Any]):
+        """تحديث سجل القنوات دون تأخير عرضها"""
+        try:
+            await self.refresh_channel_registry(registry, announce=False)
+            self.last_channels = sorted(registry['channels'].values(), key=lambda c: (c['title'] or '').lower())
+        except Exception as e:
+            logger.error(f"خطأ في تحديث سجل القنوات: {e}")
+        finally:
+            self.registry_refresh = None
+    
+    def read_directory_entries(self, path: str) -> List[Dict[str, Any]]:
+        """قراءة محتويات مجلد عبر os.scandir مع تخزين مؤقت حسب وقت تعديل المجلد
+
+        تُستخدم نتائج stat الخاصة بـ DirEntry مرة واحدة لكل عنصر، ويُعاد استخدام
+        القائمة المخزنة طالما لم يتغير وقت تعديل المجلد.
+        """
+        dir_mtime = os.stat(path).st_mtime_ns
+        cached = self.dir_cache.get(path)
+        if cached and cached[0] == dir_mtime:
+            return cached[1]
+        
+        entries = []
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir()
+                    entry_stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append({
+                    'name': entry.name,
+                    'is_dir': is_dir,
+                    'path': entry.path,
+                    'size': entry_stat.st_size,
+                    'date': entry_stat.st_mtime,
+                    'extension': '' if is_dir else os.path.splitext(entry.name)[1].lower()
+                })
+        
+        self.dir_cache[path] = (dir_mtime, entries)
+        return entries
+    
+    def invalidate_directory(self, path: Optional[str] = None):
+        """إلغاء التخزين المؤقت لمجلد لإجبار إعادة قراءته"""
+        self.dir_cache.pop(path or self.current_path, None)
+        self.view_cache = None
     
     def scan_directory(self, path: Optional[str] = None) -> List[Dict[str, Any]]:
-        """فحص مجلد محدد مع دعم البحث والتصفية"""
+        """فحص مجلد محدد مع دعم البحث والتصفية
+
+        التصفح بين الصفحات وإعادة الرسم يستخدمان النتيجة المخزنة ما دام المجلد
+        وخيارات البحث والتصفية والترتيب لم تتغير.
+        """
         if path is None:
             path = self.current_path
-            
+        
+        if self.recursive_search:
+            if self.recursive_search['root'] == path:
+                return self.search_index(path)
+            self.recursive_search = None
+        
+        self.drop_folder_sizes(path)
+        
         items = []
         
         try:
-            all_items = os.listdir(path)
+            entries = self.read_directory_entries(path)
+            view_key = (path, self.dir_cache[path][0], self.search_query, self.filter_type,
+                        self.sort_by, self.sort_reverse)
+            if self.view_cache and self.view_cache[0] == view_key:
+                return self.view_cache[1]
+            
             folders = []
             files = []
             
-            for item in all_items:
+            for entry in entries:
                 # تطبيق البحث إذا كان موجود
-                if self.search_query and self.search_query.lower() not in item.lower():
-                    continue
-                    
-                item_path = os.path.join(path, item)
-                try:
-                    if os.path.isdir(item_path):
-                        folders.append(item)
-                    else:
-                        files.append(item)
-                except PermissionError:
+                if self.search_query and self.search_query.lower() not in entry['name'].lower():
                     continue
+                
+                if entry['is_dir']:
+                    folders.append(entry)
+                else:
+                    files.append(entry)
             
             # تطبيق الترتيب
             if self.sort_by == "name":
-                folders.sort(reverse=self.sort_reverse)
-                files.sort(reverse=self.sort_reverse)
+                folders.sort(key=lambda e: e['name'], reverse=self.sort_reverse)
+                files.sort(key=lambda e: e['name'], reverse=self.sort_reverse)
             elif self.sort_by == "size":
-                files.sort(key=lambda f: os.path.getsize(os.path.join(path, f)), reverse=self.sort_reverse)
+                files.sort(key=lambda e: e['size'], reverse=self.sort_reverse)
             elif self.sort_by == "date":
-                files.sort(key=lambda f: os.path.getmtime(os.path.join(path, f)), reverse=self.sort_reverse)
+                files.sort(key=lambda e: e['date'], reverse=self.sort_reverse)
             
             # إضافة خيار العودة للمجلد الأب
             if path != "/":
@@ -222,50 +1877,34 @@ class TelegramVideoUploader:
                     'date': 0
                 })
             
-            # إضافة المجلدات
+            # إضافة المجلدات (الأحجام تُحسب في الخلفية وتظهر عند اكتمالها)
             for folder in folders:
-                folder_path = os.path.join(path, folder)
-                folder_stat = os.stat(folder_path)
+                folder_size = self.get_folder_size(folder['path'], folder['date'])
                 items.append({
-                    'name': folder,
+                    'name': folder['name'],
                     'type': 'folder',
-                    'path': folder_path,
-                    'size': self.get_folder_size(folder_path),
-                    'date': folder_stat.st_mtime
+                    'path': folder['path'],
+                    'size': folder_size or 0,
+                    'size_pending': folder_size is None,
+                    'date': folder['date']
                 })
             
             # إضافة الملفات مع تطبيق التصفية
             for file in files:
-                file_path = os.path.join(path, file)
-                try:
-                    file_stat = os.stat(file_path)
-                    file_ext = os.path.splitext(file)[1].lower()
-                    
-                    # تطبيق التصفية
-                    if self.filter_type:
-                        if self.filter_type == "video" and file_ext not in VIDEO_EXTENSIONS:
-                            continue
-                        elif self.filter_type == "audio" and file_ext not in AUDIO_EXTENSIONS:
-                            continue
-                        elif self.filter_type == "image" and file_ext not in IMAGE_EXTENSIONS:
-                            continue
-                        elif self.filter_type == "document" and file_ext not in DOCUMENT_EXTENSIONS:
-                            continue
-                        elif self.filter_type == "archive" and file_ext not in ARCHIVE_EXTENSIONS:
-                            continue
-                        elif self.filter_type == "code" and file_ext not in CODE_EXTENSIONS:
-                            continue
-                    
-                    items.append({
-                        'name': file,
-                        'type': 'file',
-                        'path': file_path,
-                        'size': file_stat.st_size,
-                        'extension': file_ext,
-                        'date': file_stat.st_mtime
-                    })
-                except OSError:
+                file_ext = file['extension']
+                
+                # تطبيق التصفية
+                if self.filter_type and self.file_kind(file) != self.filter_type:
                     continue
+                
+                items.append({
+                    'name': file['name'],
+                    'type': 'file',
+                    'path': file['path'],
+                    'size': file['size'],
+                    'extension': file_ext,
+                    'date': file['date']
+                })
             
         except PermissionError:
             print(f"{Colors.FAIL}❌ ليس لديك صلاحية الوصول لهذا المجلد!{Colors.ENDC}")
@@ -274,26 +1913,101 @@ class TelegramVideoUploader:
             logger.error(f"خطأ في فحص المجلد: {e}")
             return []
         
+        self.view_cache = (view_key, items)
         return items
     
-    def get_folder_size(self, folder_path: str) -> int:
-        """حساب حجم المجلد"""
-        total_size = 0
-        try:
-            for dirpath, dirnames, filenames in os.walk(folder_path):
-                for filename in filenames:
-                    try:
-                        filepath = os.path.join(dirpath, filename)
-                        if os.path.exists(filepath):
-                            total_size += os.path.getsize(filepath)
-                    except (OSError, PermissionError):
-                        continue
-                # توقف عند 1000 ملف لتوفير الوقت
-                if len(filenames) > 1000:
-                    break
-        except Exception:
-            pass
-        return total_size
+    def search_index(self, root: str) -> List[Dict[str, Any]]:
+        """نتائج البحث الشامل من فهرس الملفات مرتبة حسب خيارات العرض"""
+        query = self.recursive_search
+        filter_type = query['filter_type'] or self.filter_type
+        view_key = ('index', root, query['text'], self.file_index.generation, filter_type,
+                    self.sort_by, self.sort_reverse)
+        if self.view_cache and self.view_cache[0] == view_key:
+            return self.view_cache[1]
+        
+        # نتيجة زائدة عن الحد تكفي لمعرفة أن النتائج اقتُطعت
+        files = self.file_index.search(
+            root,
+            query['name'],
+            FILTER_EXTENSIONS[filter_type] if filter_type else None,
+            query['min_size'],
+            query['max_size'],
+            self.sort_by,
+            self.sort_reverse,
+            limit=SEARCH_RESULTS_LIMIT + 1
+        )
+        query['truncated'] = len(files) > SEARCH_RESULTS_LIMIT
+        del files[SEARCH_RESULTS_LIMIT:]
+        
+        items = [{'name': "..", 'type': 'parent', 'path': os.path.dirname(root), 'size': 0, 'date': 0}] if root != "/" else []
+        for file in files:
+            items.append({
+                **file,
+                'type': 'file',
+                'display_name': os.path.relpath(file['path'], root)
+            })
+        
+        self.view_cache = (view_key, items)
+        return items
+    
+    def get_folder_size(self, folder_path: str, folder_mtime: float) -> Optional[int]:
+        """الحصول على حجم المجلد من الذاكرة المؤقتة أو جدولة حسابه في الخلفية
+
+        يعيد None إذا لم يكتمل الحساب بعد. الحجم المخزن يُلغى عند تغير وقت تعديل المجلد.
+        """
+        cached = self.folder_sizes.get(folder_path)
+        if cached and cached[0] == folder_mtime:
+            return cached[1]
+        
+        future = self.folder_size_futures.get(folder_path)
+        if future is None or future.mtime != folder_mtime:
+            if future is not None:
+                self.stop_folder_size(future)
+            stop = threading.Event()
+            future = self.size_executor.submit(compute_folder_size, folder_path, stop)
+            future.mtime = folder_mtime
+            future.stop = stop
+            future.add_done_callback(lambda f, path=folder_path: self.store_folder_size(path, f))
+            self.folder_size_futures[folder_path] = future
+        return None
+    
+    def store_folder_size(self, folder_path: str, future: Future):
+        """حفظ نتيجة حساب حجم مجلد (يُستدعى من خيط الحساب)"""
+        if self.folder_size_futures.get(folder_path) is future:
+            del self.folder_size_futures[folder_path]
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self.folder_sizes[folder_path] = (future.mtime, future.result())
+    
+    @staticmethod
+    def stop_folder_size(future: Future):
+        """إلغاء حساب حجم مجلد: قبل بدئه بإلغاء المهمة، وأثناءه بإشارة الإيقاف"""
+        future.cancel()
+        future.stop.set()
+    
+    def drop_folder_sizes(self, path: str):
+        """إيقاف حساب أحجام المجلدات التي ليست ضمن المجلد المعروض (غادرها المستخدم)"""
+        for folder_path, future in list(self.folder_size_futures.items()):
+            if os.path.dirname(os.path.normpath(folder_path)) != os.path.normpath(path):
+                self.folder_size_futures.pop(folder_path, None)
+                self.stop_folder_size(future)
+    
+    def shutdown_workers(self):
+        """إيقاف عمال الخلفية عند الخروج دون انتظار المهام المنتظرة أو حسابات الأحجام الجارية"""
+        for future in list(self.folder_size_futures.values()):
+            self.stop_folder_size(future)
+        self.folder_size_futures.clear()
+        for executor in (self.size_executor, self.probe_executor, self.transcode_executor, self.scan_executor):
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.file_index.close()
+    
+    def refresh_folder_sizes(self, items: List[Dict[str, Any]]):
+        """تعبئة أحجام المجلدات التي اكتمل حسابها منذ آخر عرض"""
+        for item in items:
+            if item.get('size_pending'):
+                size = self.get_folder_size(item['path'], item['date'])
+                if size is not None:
+                    item['size'] = size
+                    item['size_pending'] = False
     
     def format_size(self, size_bytes: int) -> str:
         """تنسيق حجم الملف"""
@@ -312,6 +2026,45 @@ class TelegramVideoUploader:
         """تنسيق التاريخ"""
         return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
     
+    def file_kind(self, file_info: Dict[str, Any]) -> Optional[str]:
+        """نوع الملف (video, audio, image...) من جدول الامتدادات
+        
+        الملف بلا امتداد يُصنف من بايتاته الأولى، والنتيجة تُخزن لكل مسار حتى يتغير وقت تعديله.
+        """
+        extension = file_info.get('extension', '').lower()
+        if extension:
+            return EXTENSION_TYPES.get(extension)
+        
+        path = file_info['path']
+        mtime = file_info.get('date')
+        if mtime is None:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                return None
+        cached = self.sniffed_types.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        file_type = sniff_file_type(path)
+        self.sniffed_types[path] = (mtime, file_type)
+        return file_type
+    
+    def build_file_info(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """إنشاء معلومات ملف بنفس شكل عناصر scan_directory"""
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        name = os.path.basename(file_path)
+        return {
+            'name': name,
+            'type': 'file',
+            'path': file_path,
+            'size': file_stat.st_size,
+            'extension': os.path.splitext(name)[1].lower(),
+            'date': file_stat.st_mtime
+        }
+    
     def display_items(self, items: List[Dict[str, Any]], page: int = 0, items_per_page: int = 15) -> Tuple[int, int]:
         """عرض الملفات والمجلدات مع تقسيم الصفحات"""
         if not items:
@@ -331,14 +2084,15 @@ class TelegramVideoUploader:
         
         for i, item in enumerate(page_items, start_idx + 1):
             icon = self.get_item_icon(item)
-            size_str = self.format_size(item['size'])
+            size_str = "⏳" if item.get('size_pending') else self.format_size(item['size'])
             date_str = self.format_date(item['date']) if 'date' in item else "N/A"
-            selected = "✅" if item['path'] in [f['path'] for f in self.selected_files] else ""
+            selected = "✅" if item['path'] in self.selected_files else ""
             
             # قطع الاسم إذا كان طويلاً
-            display_name = item['name']
+            display_name = item.get('display_name', item['name'])
             if len(display_name) > 28:
-                display_name = display_name[:25] + "..."
+                # المسارات النسبية في البحث الشامل تُقطع من بدايتها ليبقى اسم الملف ظاهراً
+                display_name = "..." + display_name[-25:] if 'display_name' in item else display_name[:25] + "..."
             
             print(f"{i:3d} {icon:>4} {display_name:<30} {size_str:>10} {date_str:>16} {selected:>8}")
         
@@ -363,32 +2117,15 @@ class TelegramVideoUploader:
         elif item['type'] == 'folder':
             return "📁"
         else:
-            return self.get_file_icon(item.get('extension', ''))
-    
-    def get_file_icon(self, extension: str) -> str:
-        """الحصول على أيقونة الملف حسب النوع"""
-        if extension in VIDEO_EXTENSIONS:
-            return "🎬"
-        elif extension in AUDIO_EXTENSIONS:
-            return "🎵"
-        elif extension in IMAGE_EXTENSIONS:
-            return "🖼️"
-        elif extension in DOCUMENT_EXTENSIONS:
-            return "📄"
-        elif extension in ARCHIVE_EXTENSIONS:
-            return "📦"
-        elif extension in CODE_EXTENSIONS:
-            return "💻"
-        else:
-            return "📄"
+            return FILE_TYPE_ICONS.get(self.file_kind(item), "📄")
     
     def print_commands_help(self):
         """عرض قائمة الأوامر المتاحة بشكل متقدم"""
         print(f"\n{Colors.CYAN}🔧 الأوامر المتاحة:{Colors.ENDC}")
         print(f"{Colors.BLUE}{'-' * 50}{Colors.ENDC}")
         print(f"{Colors.GREEN}رقم         : {Colors.ENDC}فتح مجلد أو اختيار ملف")
-        print(f"{Colors.GREEN}s + رقم     : {Colors.ENDC}إضافة/إزالة ملف من المختارات")
-        print(f"{Colors.GREEN}a           : {Colors.ENDC}اختيار جميع الملفات")
+        print(f"{Colors.GREEN}s + رقم     : {Colors.ENDC}إضافة/إزالة ملف من المختارات (أو نطاق: s 3-10، s 1,4,7-9)")
+        print(f"{Colors.GREEN}a           : {Colors.ENDC}اختيار جميع الملفات (أو حسب نمط: a *.mkv)")
         print(f"{Colors.GREEN}c           : {Colors.ENDC}مسح المختارات")
         print(f"{Colors.GREEN}u           : {Colors.ENDC}رفع الملفات المختارة")
         print(f"{Colors.GREEN}r           : {Colors.ENDC}تحديث المحتويات")
@@ -396,9 +2133,11 @@ class TelegramVideoUploader:
         print(f"{Colors.GREEN}n           : {Colors.ENDC}الصفحة التالية")
         print(f"{Colors.GREEN}p           : {Colors.ENDC}الصفحة السابقة")
         print(f"{Colors.GREEN}/ كلمة      : {Colors.ENDC}بحث عن ملفات")
+        print(f"{Colors.GREEN}// استعلام  : {Colors.ENDC}بحث شامل في المجلدات الفرعية (مثال: // *.mkv >1gb video)")
         print(f"{Colors.GREEN}f نوع       : {Colors.ENDC}تصفية حسب النوع (video, audio, image, document, archive, code)")
         print(f"{Colors.GREEN}o نوع       : {Colors.ENDC}ترتيب حسب (name, size, date)")
         print(f"{Colors.GREEN}b           : {Colors.ENDC}إدارة الإشارات المرجعية")
+        print(f"{Colors.GREEN}j           : {Colors.ENDC}مهام الرفع في الخلفية (إيقاف، إلغاء، أولوية)")
         print(f"{Colors.GREEN}i           : {Colors.ENDC}معلومات عن الملف المحدد")
         print(f"{Colors.GREEN}q           : {Colors.ENDC}خروج")
         print(f"{Colors.BLUE}{'-' * 50}{Colors.ENDC}")
@@ -409,12 +2148,12 @@ class TelegramVideoUploader:
             print(f"\n{Colors.WARNING}📭 لا توجد ملفات مختارة!{Colors.ENDC}")
             return
             
-        total_size = sum(f['size'] for f in self.selected_files)
+        total_size = self.selected_files.total_size
         print(f"\n{Colors.CYAN}📋 الملفات المختارة ({len(self.selected_files)} ملف - {self.format_size(total_size)}):{Colors.ENDC}")
         print(f"{Colors.BLUE}{'-' * 60}{Colors.ENDC}")
         
-        for i, file in enumerate(self.selected_files[:10], 1):
-            icon = self.get_file_icon(file.get('extension', ''))
+        for i, file in enumerate(self.selected_files.head(10), 1):
+            icon = FILE_TYPE_ICONS.get(self.file_kind(file), "📄")
             size = self.format_size(file['size'])
             date = self.format_date(file['date']) if 'date' in file else "N/A"
             name = file['name']
@@ -426,20 +2165,30 @@ class TelegramVideoUploader:
             print(f"    ... و {len(self.selected_files) - 10} ملف آخر")
         print(f"{Colors.BLUE}{'-' * 60}{Colors.ENDC}")
     
-    async def display_channels_interactive(self) -> Optional[Dict[str, Any]]:
-        """عرض القنوات بشكل تفاعلي متقدم"""
+    def parse_manual_channels(self, text: str) -> List[Dict[str, Any]]:
+        """تحويل معرفات مكتوبة يدوياً (مفصولة بفواصل) إلى قنوات"""
+        channels = []
+        for manual_id in (part.strip() for part in text.split(',')):
+            if not (manual_id.startswith('@') or manual_id.lstrip('-').isdigit()):
+                return []
+            channels.append({'id': manual_id, 'title': f'قناة مخصصة ({manual_id})', 'type': 'manual'})
+        return channels
+    
+    async def display_channels_interactive(self) -> List[Dict[str, Any]]:
+        """عرض القنوات بشكل تفاعلي متقدم مع إمكانية اختيار عدة قنوات"""
         channels = await self.get_bot_channels()
         
         if not channels:
             print(f"\n{Colors.FAIL}❌ لم يتم العثور على قنوات!{Colors.ENDC}")
-            print(f"{Colors.CYAN}💡 يمكنك إدخال معرف قناة يدوياً:{Colors.ENDC}")
+            print(f"{Colors.CYAN}💡 يمكنك إدخال معرف قناة يدوياً (أو عدة معرفات مفصولة بفواصل):{Colors.ENDC}")
             
             while True:
-                manual_id = input(f"{Colors.GREEN}📺 معرف القناة (@username أو رقم) أو Enter للتخطي: {Colors.ENDC}").strip()
+                manual_id = (await self.ask(f"{Colors.GREEN}📺 معرف القناة (@username أو رقم) أو Enter للتخطي: {Colors.ENDC}")).strip()
                 if not manual_id:
-                    return None
-                if manual_id.startswith('@') or manual_id.lstrip('-').isdigit():
-                    return {'id': manual_id, 'title': 'قناة مخصصة', 'type': 'manual'}
+                    return []
+                manual_channels = self.parse_manual_channels(manual_id)
+                if manual_channels:
+                    return manual_channels
                 print(f"{Colors.FAIL}❌ معرف غير صحيح! استخدم @username أو رقم{Colors.ENDC}")
         
         print(f"\n{Colors.CYAN}📺 القنوات المتاحة ({len(channels)} قناة):{Colors.ENDC}")
@@ -455,98 +2204,249 @@ class TelegramVideoUploader:
         
         while True:
             try:
-                choice = input(f"{Colors.GREEN}🔢 اختر رقم القناة (1-{len(channels)}) أو 'm' لإدخال يدوي: {Colors.ENDC}").strip()
+                choice = (await self.ask(f"{Colors.GREEN}🔢 اختر رقم القناة (1-{len(channels)})، عدة أرقام مثل 1,3، 'all' للكل، أو 'm' لإدخال يدوي: {Colors.ENDC}")).strip()
                 
                 if choice.lower() == 'm':
-                    manual_id = input(f"{Colors.GREEN}📺 معرف القناة: {Colors.ENDC}").strip()
-                    if manual_id:
-                        return {'id': manual_id, 'title': 'قناة مخصصة', 'type': 'manual'}
+                    manual_id = (await self.ask(f"{Colors.GREEN}📺 معرف القناة: {Colors.ENDC}")).strip()
+                    manual_channels = self.parse_manual_channels(manual_id) if manual_id else []
+                    if manual_channels:
+                        return manual_channels
                     continue
                 
-                choice_num = int(choice)
-                if 1 <= choice_num <= len(channels):
-                    return channels[choice_num - 1]
+                if choice.lower() == 'all':
+                    return list(channels)
+                
+                choice_nums = [int(part) for part in choice.split(',') if part.strip()]
+                if choice_nums and all(1 <= num <= len(channels) for num in choice_nums):
+                    # إزالة التكرار مع الحفاظ على الترتيب
+                    return [channels[num - 1] for num in dict.fromkeys(choice_nums)]
                 else:
-                    print(f"{Colors.FAIL}❌ اختر رقم من 1 إلى {len(channels)}{Colors.ENDC}")
+                    print(f"{Colors.FAIL}❌ اختر أرقام من 1 إلى {len(channels)}{Colors.ENDC}")
                     
             except ValueError:
                 print(f"{Colors.FAIL}❌ أدخل رقم صحيح!{Colors.ENDC}")
     
+    async def send_by_type(self, chat_id: str, media: Any, media_type: str, caption: str,
+                           upload_size: int = 0, **video_kwargs: Any):
+        """إرسال وسائط (ملف مفتوح أو file_id) كفيديو أو وثيقة (أو صورة وصوت من ألبومات سابقة)
+
+        upload_size يحدد مهل الطلب (0 لإعادة الإرسال عبر file_id).
+        video_kwargs (width, height, duration) تُمرر لـ send_video فقط.
+        """
+        timeouts = self.request_timeouts(upload_size)
+        if media_type == 'photo':
+            return await self.bot.send_photo(chat_id=chat_id, photo=media, caption=caption, **timeouts)
+        if media_type == 'audio':
+            return await self.bot.send_audio(chat_id=chat_id, audio=media, caption=caption, **timeouts)
+        if media_type == 'video':
+            return await self.bot.send_video(
+                chat_id=chat_id,
+                video=media,
+                caption=caption,
+                supports_streaming=True,
+                **timeouts,
+                **video_kwargs
+            )
+        return await self.bot.send_document(
+            chat_id=chat_id,
+            document=media,
+            caption=caption,
+            **timeouts
+        )
+    
+    async def send_media(self, chat_id: str, file_path: str, media_type: str, caption: str,
+                         thumbnail_path: Optional[str] = None, **video_kwargs: Any):
+        """إرسال ملف من القرص كفيديو أو وثيقة
+
+        الملف يُمرر كمقبض دون قراءته مسبقاً، فتقرؤه طبقة HTTP على دفعات أثناء الإرسال.
+        في الوضع المحلي يُرسل مسار الملف (file://) فيقرؤه الخادم مباشرة من القرص.
+        """
+        upload_size = os.path.getsize(file_path)
+        if self.local_mode:
+            if thumbnail_path and media_type == 'video':
+                video_kwargs['thumbnail'] = Path(thumbnail_path).absolute()
+            return await self.send_by_type(chat_id, Path(file_path).absolute(), media_type, caption,
+                                           upload_size, **video_kwargs)
+        
+        with open(file_path, 'rb') as file, contextlib.ExitStack() as stack:
+            if thumbnail_path and media_type == 'video':
+                video_kwargs['thumbnail'] = stack.enter_context(open(thumbnail_path, 'rb'))
+            media = InputFile(file, read_file_handle=False)
+            return await self.send_by_type(chat_id, media, media_type, caption, upload_size, **video_kwargs)
+    
+    async def send_file_slice(self, chat_id: str, file_info: Dict[str, Any], caption: str):
+        """إرسال جزء من ملف كوثيقة بقراءته من الملف الأصلي مباشرة
+
+        يُرفع عبر multipart حتى في الوضع المحلي لأن مسار file:// لا يحدد جزءاً من ملف،
+        وبصمة الجزء المحسوبة أثناء القراءة تُحفظ في file_info['sha256'].
+        """
+        with FileSlice(file_info['source'], file_info['offset'], file_info['size']) as part:
+            media = InputFile(part, filename=file_info['name'], read_file_handle=False)
+            message = await self.send_by_type(chat_id, media, 'document', caption, file_info['size'])
+            file_info['sha256'] = part.sha256
+            return message
+    
+    def extract_file_id(self, message: Any) -> Optional[Tuple[str, str]]:
+        """استخراج (file_id, media_type) من رسالة الإرسال"""
+        if getattr(message, 'video', None):
+            return message.video.file_id, 'video'
+        if getattr(message, 'document', None):
+            return message.document.file_id, 'document'
+        if getattr(message, 'photo', None):
+            return message.photo[-1].file_id, 'photo'
+        if getattr(message, 'audio', None):
+            return message.audio.file_id, 'audio'
+        return None
+    
+    def remember_sent_media(self, file_path: str, file_id: str, media_type: str, caption: str, fingerprint: Optional[str]):
+        """حفظ file_id آخر إرسال للملف لإعادة استخدامه عند التوزيع على قنوات أخرى"""
+        self.sent_media[file_path] = {
+            'file_id': file_id,
+            'media_type': media_type,
+            'caption': caption,
+            'fingerprint': fingerprint
+        }
+    
+    def already_sent(self, sent: Dict[str, Any], chat_id: str) -> bool:
+        """هل أُرسل المحتوى لهذه القناة سابقاً ويجب تخطيه حسب dedup_mode"""
+        return (
+            self.config.get('dedup_mode', 'skip') == 'skip'
+            and bool(sent['fingerprint'])
+            and self.store.find_upload(sent['fingerprint'], chat_id) is not None
+        )
+    
+    async def fan_out(self, file_info: Dict[str, Any], chat_ids: List[str]) -> List[Tuple[bool, str]]:
+        """إعادة إرسال ملف مرفوع إلى قنوات إضافية عبر file_id بالتوازي دون إعادة رفع
+
+        القنوات التي وصلها نفس المحتوى سابقاً تُتخطى حسب dedup_mode.
+        """
+        filename = file_info['name']
+        sent = self.sent_media.get(file_info['path'])
+        if not sent:
+            return [(False, f"لا يوجد file_id محفوظ لـ {filename}") for _ in chat_ids]
+        
+        async def send_to(chat_id: str) -> Tuple[bool, str]:
+            if self.already_sent(sent, chat_id):
+                return True, f"⏭️ تم تخطي {filename} في {chat_id} (مرفوع مسبقاً لهذه القناة)"
+            try:
+                await self.call_with_rate_limit(
+                    chat_id,
+                    lambda: self.send_by_type(chat_id, sent['file_id'], sent['media_type'], sent['caption'])
+                )
+                if sent['fingerprint']:
+                    self.store.record_upload(sent['fingerprint'], chat_id, sent['file_id'], sent['media_type'])
+                return True, f"تم إرسال {filename} إلى {chat_id}"
+            except Exception as e:
+                error_msg = f"فشل إرسال {filename} إلى {chat_id}: {str(e)}"
+                logger.error(error_msg)
+                return False, error_msg
+        
+        return list(await asyncio.gather(*(send_to(chat_id) for chat_id in chat_ids)))
+    
+    def build_caption(self, file_info: Dict[str, Any], current_num: int, total_num: int) -> str:
+        """الوصف المحدد للملف أو الوصف الافتراضي من الإعدادات"""
+        caption = file_info.get('caption')
+        if caption is None:
+            caption = self.config.get('default_caption', "📦 {filename}\n💾 الحجم: {size}")
+            caption = caption.replace('{filename}', file_info['name'])
+            caption = caption.replace('{size}', self.format_size(file_info['size']))
+            caption += f"\n🔢 ملف {current_num} من {total_num}"
+        return caption
+    
     async def upload_file(self, file_info: Dict[str, Any], chat_id: str, current_num: int, total_num: int) -> Tuple[bool, str]:
         """رفع ملف واحد مع معلومات التقدم المتقدمة"""
+        file_path = file_info['path']
+        filename = file_info['name']
+        file_size = file_info['size']
+        # أجزاء الملف المقسم تُقرأ من الملف الأصلي، و path لها مفتاح فريد فقط
+        source_path = file_info.get('source', file_path)
+        progress = BATCH_PROGRESS.get() or UploadProgress(1, file_size, self.render_progress)
+        attempts = 0
+        began = time.monotonic()
+        
         try:
-            file_path = file_info['path']
-            filename = file_info['name']
-            file_size = file_info['size']
+            if not os.path.exists(source_path):
+                return False, f"الملف غير موجود: {filename}"
+            
+            if file_size > MAX_DOCUMENT_SIZE:
+                return False, f"الملف أكبر من الحد المسموح ({self.format_size(MAX_DOCUMENT_SIZE)}): {filename}"
+            
+            # تحديد نوع الرفع
+            is_video = self.file_kind(file_info) == 'video'
+            upload_type = file_info.get('upload_as') or self.config.get('default_upload_type', 'auto')
+            
+            if upload_type == 'auto':
+                media_type = 'video' if is_video and file_size <= self.max_video_size else 'document'
+            elif upload_type == 'video':
+                if not is_video:
+                    return False, f"الملف ليس فيديو: {filename}"
+                media_type = 'video'
+            else:  # document
+                media_type = 'document'
+            
+            caption = self.build_caption(file_info, current_num, total_num)
+            
+            # التحقق من رفع نفس المحتوى سابقاً
+            dedup_mode = self.config.get('dedup_mode', 'skip')
+            fingerprint = None
+            if dedup_mode != 'off':
+                fingerprint = await asyncio.to_thread(
+                    file_fingerprint, source_path, file_size, self.config.get('dedup_full_hash', False),
+                    file_info.get('offset', 0)
+                )
+                previous = self.store.find_upload(fingerprint, chat_id)
+                if previous and dedup_mode == 'skip':
+                    self.remember_sent_media(file_path, previous[1], previous[2], caption, fingerprint)
+                    return True, f"⏭️ تم تخطي {filename} (مرفوع مسبقاً لهذه القناة)"
+                previous = previous or self.store.find_upload(fingerprint)
+                if previous:
+                    _, cached_file_id, cached_type = previous
+                    await self.call_with_rate_limit(
+                        chat_id,
+                        lambda: self.send_by_type(chat_id, cached_file_id, cached_type, caption)
+                    )
+                    self.store.record_upload(fingerprint, chat_id, cached_file_id, cached_type)
+                    self.remember_sent_media(file_path, cached_file_id, cached_type, caption, fingerprint)
+                    return True, f"♻️ تم إرسال {filename} من file_id محفوظ دون إعادة رفع"
             
-            if not os.path.exists(file_path):
-                return False, f"الملف غير موجود: {filename}"
+            # أبعاد الفيديو ومدته حتى لا يعيد تيليجرام استخراجها
+            video_kwargs = {}
+            if media_type == 'video':
+                media_info = file_info.get('media_info') or await self.get_media_info(file_path)
+                video_kwargs = self.video_attributes(media_info)
             
-            # تحديد نوع الرفع
-            ext = file_info.get('extension', '').lower()
-            upload_type = self.config.get('default_upload_type', 'auto')
+            # متابعة البايتات المرسلة فعلياً
+            progress.start_file(file_path, file_size)
+            started = time.monotonic()
             
-            caption = self.config.get('default_caption', "📦 {filename}\n💾 الحجم: {size}")
-            caption = caption.replace('{filename}', filename)
-            caption = caption.replace('{size}', self.format_size(file_size))
-            caption += f"\n🔢 ملف {current_num} من {total_num}"
+            async def send_attempt():
+                # إعادة فتح الملف وتصفير العداد في كل محاولة لأن الطلب السابق استهلك محتواه
+                nonlocal attempts
+                attempts += 1
+                progress.reset_file(file_path)
+                if 'source' in file_info:
+                    return await self.send_file_slice(chat_id, file_info, caption)
+                return await self.send_media(
+                    chat_id, file_path, media_type, caption, file_info.get('thumbnail_path'), **video_kwargs
+                )
             
-            print(f"{Colors.CYAN}📤 [{current_num}/{total_num}] {filename} ({self.format_size(file_size)}){Colors.ENDC}")
-            
-            # شريط التقدم
-            progress_bar = self.create_progress_bar(0, 100, 30)
-            print(f"{Colors.GREEN}[{progress_bar}]{Colors.ENDC} 0%")
-            
-            with open(file_path, 'rb') as file:
-                if upload_type == 'auto':
-                    if ext in VIDEO_EXTENSIONS and file_size <= MAX_VIDEO_SIZE:
-                        message = await self.bot.send_video(
-                            chat_id=chat_id,
-                            video=file,
-                            caption=caption,
-                            supports_streaming=True,
-                            read_timeout=60,
-                            write_timeout=60,
-                            connect_timeout=60,
-                            pool_timeout=60
-                        )
-                    else:
-                        message = await self.bot.send_document(
-                            chat_id=chat_id,
-                            document=file,
-                            caption=caption,
-                            read_timeout=60,
-                            write_timeout=60,
-                            connect_timeout=60,
-                            pool_timeout=60
-                        )
-                elif upload_type == 'video':
-                    if ext not in VIDEO_EXTENSIONS:
-                        return False, f"الملف ليس فيديو: {filename}"
-                    message = await self.bot.send_video(
-                        chat_id=chat_id,
-                        video=file,
-                        caption=caption,
-                        supports_streaming=True,
-                        read_timeout=60,
-                        write_timeout=60,
-                        connect_timeout=60,
-                        pool_timeout=60
-                    )
-                else:  # document
-                    message = await self.bot.send_document(
-                        chat_id=chat_id,
-                        document=file,
-                        caption=caption,
-                        read_timeout=60,
-                        write_timeout=60,
-                        connect_timeout=60,
-                        pool_timeout=60
-                    )
+            token = UPLOAD_PROGRESS.set(lambda count: progress.add_bytes(file_path, count))
+            try:
+                message = await self.call_with_rate_limit(chat_id, send_attempt)
+            finally:
+                UPLOAD_PROGRESS.reset(token)
             
-            # تحديث شريط التقدم
-            progress_bar = self.create_progress_bar(100, 100, 30)
-            print(f"\r{Colors.GREEN}[{progress_bar}]{Colors.ENDC} 100%")
+            if self.local_mode and 'source' not in file_info:
+                # الخادم المحلي قرأ الملف من القرص دون مروره عبر طبقة HTTP
+                progress.add_bytes(file_path, file_size)
+            
+            speed = file_size / max(time.monotonic() - started, 1e-6)
+            
+            uploaded = self.extract_file_id(message)
+            if uploaded:
+                self.remember_sent_media(file_path, uploaded[0], uploaded[1], caption, fingerprint)
+                if fingerprint:
+                    self.store.record_upload(fingerprint, chat_id, *uploaded)
             
             # حفظ في التاريخ
             self.upload_history.append({
@@ -554,14 +2454,19 @@ class TelegramVideoUploader:
                 'size': file_size,
                 'chat_id': chat_id,
                 'timestamp': time.time(),
-                'success': True
+                'success': True,
+                'retries': max(attempts - 1, 0),
+                'duration': time.monotonic() - began
             })
             
-            return True, f"تم رفع {filename} بنجاح"
+            return True, f"تم رفع {filename} بنجاح ({self.format_size(int(speed))}/s)"
             
         except Exception as e:
             error_msg = f"فشل رفع {filename}: {str(e)}"
             logger.error(error_msg)
+            transient = is_transient_error(e)
+            if transient:
+                progress.retryable.add(file_path)
             
             # حفظ في التاريخ
             self.upload_history.append({
@@ -570,10 +2475,51 @@ class TelegramVideoUploader:
                 'chat_id': chat_id,
                 'timestamp': time.time(),
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                'transient': transient,
+                'retries': max(attempts - 1, 0),
+                'duration': time.monotonic() - began
             })
             
             return False, error_msg
+        
+        finally:
+            progress.end_file(file_path, file_size)
+    
+    def emit_event(self, event: str, **data: Any):
+        """طباعة حدث بصيغة JSON في سطر واحد (وضع التشغيل غير التفاعلي)"""
+        print(json.dumps({'event': event, 'time': round(time.time(), 3), **data}, ensure_ascii=False), flush=True)
+    
+    def render_progress(self, progress: UploadProgress):
+        """رسم سطر تقدم الدفعة في مكانه"""
+        processed = progress.processed_bytes
+        if self.headless:
+            self.emit_event(
+                'progress',
+                files_done=progress.completed_files,
+                files_total=progress.total_files,
+                files_failed=progress.failed_files,
+                bytes_done=processed,
+                bytes_total=progress.total_bytes,
+                speed=round(progress.current_speed),
+                average_speed=round(progress.average_speed),
+                eta=round(progress.eta, 1) if progress.eta is not None else None,
+                active=len(progress.active)
+            )
+            return
+        
+        percent = min(processed / progress.total_bytes * 100, 100) if progress.total_bytes else 100
+        progress_bar = self.create_progress_bar(processed, progress.total_bytes, 30)
+        eta = progress.eta
+        eta_str = f"{int(eta // 60):02d}:{int(eta % 60):02d}" if eta is not None else "--:--"
+        line = (
+            f"[{progress_bar}] {percent:5.1f}% | 📦 {progress.completed_files}/{progress.total_files}"
+            f" | ⚡ {self.format_size(int(progress.current_speed))}/s"
+            f" (متوسط {self.format_size(int(progress.average_speed))}/s)"
+            f" | ⏱️ {eta_str} | 🔄 {len(progress.active)}"
+        )
+        sys.stdout.write(f"\r\033[K{Colors.GREEN}{line}{Colors.ENDC}")
+        sys.stdout.flush()
     
     def create_progress_bar(self, current: int, total: int, width: int = 30) -> str:
         """إنشاء شريط تقدم"""
@@ -585,11 +2531,850 @@ class TelegramVideoUploader:
         bar = "=" * filled + "-" * (width - filled)
         return bar
     
+    def get_chat_limiter(self, chat_id: str) -> TokenBucket:
+        """الحصول على محدد المعدل الخاص بقناة"""
+        key = str(chat_id)
+        if key not in self.chat_limiters:
+            per_minute = float(self.config.get('chat_rate_limit', 20))
+            self.chat_limiters[key] = TokenBucket(per_minute / 60, max(1.0, per_minute / 4))
+        return self.chat_limiters[key]
+    
+    async def call_with_rate_limit(self, chat_id: str, request):
+        """تنفيذ طلب مع احترام حدود المعدل وإعادة المحاولة
+
+        RetryAfter: انتظار المدة التي يحددها الخادم (حتى flood_retries مرة).
+        أخطاء الشبكة والمهلة: انتظار أسي مع تشويش (حتى network_retries مرة).
+        الأخطاء الدائمة (BadRequest، Forbidden...) تُرفع فوراً.
+        """
+        flood_retries = int(self.config.get('flood_retries', 5))
+        network_retries = int(self.config.get('network_retries', 3))
+        backoff_base = float(self.config.get('retry_backoff', 1.0))
+        backoff_max = float(self.config.get('retry_backoff_max', 30.0))
+        chat_limiter = self.get_chat_limiter(chat_id)
+        flood_attempts = network_attempts = 0
+        
+        while True:
+            await chat_limiter.acquire()
+            await self.global_limiter.acquire()
+            try:
+                return await request()
+            except RetryAfter as e:
+                if flood_attempts >= flood_retries:
+                    raise
+                flood_attempts += 1
+                delay = retry_after_seconds(e)
+                logger.warning(f"تجاوز حد المعدل للقناة {chat_id}، إعادة المحاولة بعد {delay:.0f} ثانية")
+                chat_limiter.penalize(delay)
+                # تجاوز الحد في قناة قد يعني ضغطاً على البوت كله: تهدئة المعدل العام دون إيقافه
+                self.global_limiter.slow_down(0.8)
+            except Exception as e:
+                if not is_transient_error(e) or network_attempts >= network_retries:
+                    raise
+                delay = backoff_delay(network_attempts, backoff_base, backoff_max)
+                network_attempts += 1
+                logger.warning(f"خطأ مؤقت في الاتصال بالقناة {chat_id} ({e})، "
+                               f"المحاولة {network_attempts}/{network_retries} بعد {delay:.1f} ثانية")
+                await asyncio.sleep(delay)
+            
+            progress = BATCH_PROGRESS.get()
+            if progress is not None:
+                progress.retries += 1
+    
+    def media_info_key(self, file_path: str) -> Tuple[str, int, float]:
+        """مفتاح التخزين المؤقت لمعلومات الوسائط: المسار والحجم ووقت التعديل"""
+        file_stat = os.stat(file_path)
+        return file_path, file_stat.st_size, file_stat.st_mtime
+    
+    def cached_media_info(self, key: Tuple[str, int, float]) -> Optional[Dict[str, Any]]:
+        """معلومات الوسائط من الذاكرة أو من القرص إن وُجدت"""
+        self.persist_media_info()
+        if key in self.media_info_cache:
+            return self.media_info_cache[key]
+        info = self.store.get_media_info(*key)
+        if info is not None:
+            self.media_info_cache[key] = info
+        return info
+    
+    def persist_media_info(self):
+        """حفظ نتائج الفحص المكتملة على القرص (من الخيط الرئيسي فقط)"""
+        with self.media_info_lock:
+            entries, self.media_info_unsaved = self.media_info_unsaved, []
+        if entries:
+            self.store.save_media_info([(*key, info) for key, info in entries])
+    
+    def submit_probe(self, key: Tuple[str, int, float]) -> Future:
+        """جدولة فحص ملف في مجموعة عمال ffprobe مع تجنب تكرار الفحص الجاري"""
+        if not self.ffprobe_available:
+            # بدون ffprobe لا فائدة من جدولة فحص سيفشل حتماً
+            future = Future()
+            future.set_result({})
+            return future
+        future = self.probe_futures.get(key)
+        if future is None:
+            future = self.probe_executor.submit(probe_media, key[0])
+            future.add_done_callback(lambda f, key=key: self.store_probe_result(key, f))
+            self.probe_futures[key] = future
+        return future
+    
+    def store_probe_result(self, key: Tuple[str, int, float], future: Future):
+        """حفظ نتيجة الفحص في الذاكرة (يُستدعى من خيط الفحص)"""
+        self.probe_futures.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.media_info_cache[key] = future.result()
+            with self.media_info_lock:
+                self.media_info_unsaved.append((key, future.result()))
+    
+    async def get_media_info(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """معلومات الفيديو (أبعاد، مدة، ترميز) من الذاكرة المؤقتة أو بفحص غير متزامن"""
+        try:
+            key = self.media_info_key(file_path)
+            info = self.cached_media_info(key)
+            if info is None:
+                info = await asyncio.wrap_future(self.submit_probe(key))
+                self.persist_media_info()
+            return info
+        except Exception as e:
+            logger.warning(f"تعذر فحص {file_path}: {e}")
+            return None
+    
+    def prefetch_media_info(self, items: List[Dict[str, Any]]):
+        """جلب معلومات فيديوهات الصفحة المعروضة مسبقاً في الخلفية"""
+        if not self.ffprobe_available:
+            return
+        for item in items:
+            if item['type'] == 'file' and self.file_kind(item) == 'video':
+                key = (item['path'], item['size'], item['date'])
+                if self.cached_media_info(key) is None:
+                    self.submit_probe(key)
+    
+    def video_attributes(self, info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """تحويل معلومات الفحص إلى معاملات send_video"""
+        if not info:
+            return {}
+        attributes = {}
+        if info.get('width') and info.get('height'):
+            attributes['width'] = info['width']
+            attributes['height'] = info['height']
+        if info.get('duration'):
+            attributes['duration'] = int(round(info['duration']))
+        return attributes
+    
+    async def get_thumbnail(self, file_path: str, media_info: Optional[Dict[str, Any]]) -> Optional[str]:
+        """صورة مصغرة للفيديو من ذاكرة LRU على القرص أو باستخراجها في الخلفية"""
+        if not self.config.get('thumbnails', True) or not shutil.which('ffmpeg'):
+            return None
+        
+        try:
+            key = '|'.join(str(part) for part in self.media_info_key(file_path))
+            thumb_path = os.path.join(THUMBNAIL_CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + '.jpg')
+            if os.path.exists(thumb_path):
+                os.utime(thumb_path)  # تحديث وقت الاستخدام لسياسة LRU
+                return thumb_path
+            
+            os.makedirs(THUMBNAIL_CACHE_DIR, exist_ok=True)
+            duration = (media_info or {}).get('duration', 0)
+            offset = min(duration * 0.1, 10.0) if duration else 0.0
+            loop = asyncio.get_running_loop()
+            # استخراج إطار واحد عملية قصيرة، فتشارك عمال الفحص بدل مجموعة مستقلة
+            await loop.run_in_executor(self.probe_executor, extract_thumbnail, file_path, thumb_path, offset)
+            
+            max_bytes = int(self.config.get('thumbnail_cache_mb', 200)) * 1024 * 1024
+            await loop.run_in_executor(self.probe_executor, prune_cache_dir, THUMBNAIL_CACHE_DIR, max_bytes)
+            return thumb_path if os.path.exists(thumb_path) else None
+        except Exception as e:
+            logger.warning(f"تعذر إنشاء صورة مصغرة لـ {file_path}: {e}")
+            return None
+    
+    def should_transcode(self, file_info: Dict[str, Any]) -> bool:
+        """هل يجب ضغط الفيديو ليُرفع كفيديو متدفق بدل وثيقة؟"""
+        upload_type = file_info.get('upload_as') or self.config.get('default_upload_type', 'auto')
+        return (
+            self.config.get('auto_compress', False)
+            and upload_type in ('auto', 'video')
+            and file_info['size'] > self.max_video_size
+            and self.file_kind(file_info) == 'video'
+        )
+    
+    async def transcode(self, file_info: Dict[str, Any]) -> str:
+        """ضغط فيديو في الخلفية مع إعادة استخدام النسخ المضغوطة سابقاً"""
+        if not shutil.which('ffmpeg'):
+            raise RuntimeError("ffmpeg غير مثبت")
+        
+        crf = int(self.config.get('compress_quality', 28))
+        fingerprint = await asyncio.to_thread(file_fingerprint, file_info['path'], file_info['size'])
+        cache_key = fingerprint.split(':', 1)[1][:32]
+        output_path = os.path.join(TRANSCODE_CACHE_DIR, f"{cache_key}_crf{crf}_{TRANSCODE_PRESET}.mp4")
+        if os.path.exists(output_path):
+            os.utime(output_path)  # تحديث وقت الاستخدام لسياسة LRU
+            return output_path
+        
+        os.makedirs(TRANSCODE_CACHE_DIR, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.transcode_executor, transcode_video, file_info['path'], output_path, crf
+        )
+        
+        max_bytes = int(self.config.get('transcode_cache_mb', 4096)) * 1024 * 1024
+        keep = [output_path, *self.transcodes_in_use]
+        await asyncio.to_thread(prune_cache_dir, TRANSCODE_CACHE_DIR, max_bytes, keep)
+        return output_path
+    
+    async def prepare_upload(self, file_info: Dict[str, Any]) -> Dict[str, Any]:
+        """تجهيز الملف قبل الرفع: ضغط الفيديوهات الكبيرة وفحص أبعاد الفيديو وصورته المصغرة"""
+        upload_info = await self.transcode_if_needed(file_info)
+        if self.file_kind(upload_info) == 'video':
+            media_info = await self.get_media_info(upload_info['path'])
+            upload_info = {
+                **upload_info,
+                'media_info': media_info,
+                'thumbnail_path': await self.get_thumbnail(upload_info['path'], media_info)
+            }
+        return upload_info
+    
+    async def transcode_if_needed(self, file_info: Dict[str, Any]) -> Dict[str, Any]:
+        """ضغط الفيديو عند تفعيل auto_compress وإعادة معلومات الملف الناتج"""
+        if not self.should_transcode(file_info):
+            return file_info
+        
+        try:
+            output_path = await self.transcode(file_info)
+        except Exception as e:
+            logger.warning(f"تعذر ضغط {file_info['name']}، سيُرفع الأصل: {e}")
+            return file_info
+        
+        output_size = os.path.getsize(output_path)
+        if output_size > self.max_video_size:
+            logger.info(f"النسخة المضغوطة من {file_info['name']} ما زالت أكبر من حد الفيديو، سيُرفع الأصل")
+            return file_info
+        
+        self.transcodes_in_use[output_path] += 1  # يُحرر بعد رفعه
+        return {
+            **file_info,
+            'name': os.path.splitext(file_info['name'])[0] + '.mp4',
+            'path': output_path,
+            'size': output_size,
+            'extension': '.mp4',
+            'source_path': file_info['path']
+        }
+    
+    def release_transcode(self, upload_info: Dict[str, Any]):
+        """تحرير نسخة مضغوطة انتهى رفعها حتى يمكن حذفها من الذاكرة المؤقتة"""
+        if 'source_path' not in upload_info:
+            return
+        path = upload_info['path']
+        self.transcodes_in_use[path] -= 1
+        if self.transcodes_in_use[path] <= 0:
+            del self.transcodes_in_use[path]
+    
+    def needs_split(self, file_info: Dict[str, Any]) -> bool:
+        """هل يجب تقسيم الملف لأنه أكبر من حد البوت؟"""
+        return file_info['size'] > MAX_DOCUMENT_SIZE and self.config.get('split_large_files', True)
+    
+    @contextlib.asynccontextmanager
+    async def upload_slot(self):
+        """حجز مكان من الرفعات المتزامنة
+
+        داخل مهمة خلفية موقوفة ينتظر الاستئناف قبل الحجز وبعده، فالملفات المنتظرة
+        في الطابور لا تبدأ ولا تحجز أماكن رفعات المهام الأخرى.
+        """
+        job = CURRENT_JOB.get()
+        while True:
+            if job is not None:
+                await job.resumed.wait()
+            await self.upload_slots.acquire()
+            if job is None or job.resumed.is_set():
+                break
+            self.upload_slots.release()
+        try:
+            yield
+        finally:
+            self.upload_slots.release()
+    
+    async def upload_file_slot(self, file_info: Dict[str, Any], chat_id: str, current_num: int, total_num: int) -> Tuple[bool, str]:
+        """رفع ملف بعد حجز مكان من الرفعات المتزامنة"""
+        async with self.upload_slot():
+            return await self.upload_file(file_info, chat_id, current_num, total_num)
+    
+    async def upload_and_fan_out(self, file_info: Dict[str, Any], chat_id: str, extra_chat_ids: List[str],
+                                 current_num: int, total_num: int) -> Tuple[bool, str]:
+        """رفع ملف مرة واحدة للقناة الأساسية ثم توزيعه على باقي القنوات عبر file_id"""
+        success, message = await self.upload_file_slot(file_info, chat_id, current_num, total_num)
+        if not success or not extra_chat_ids:
+            return success, message
+        
+        fan_out_results = await self.fan_out(file_info, extra_chat_ids)
+        failed = [msg for ok, msg in fan_out_results if not ok]
+        if failed:
+            return False, f"{message} لكن فشل التوزيع على {len(failed)} قناة: {failed[0]}"
+        return True, f"{message} (+{len(extra_chat_ids)} قناة عبر file_id)"
+    
+    async def upload_split_file(self, file_info: Dict[str, Any], chat_id: str,
+                                extra_chat_ids: Optional[List[str]] = None) -> Tuple[bool, str]:
+        """رفع ملف كبير على أجزاء بالتوازي ثم رفع بيان إعادة التجميع
+
+        كل جزء يُقرأ مباشرة من الملف الأصلي (FileSlice) فلا تُكتب نسخة منه على القرص،
+        وبصمة كل جزء تُحسب أثناء رفعه. بصمة الملف كاملاً تُحسب في خيط بالتوازي مع الرفع.
+        """
+        filename = file_info['name']
+        source_path = file_info['path']
+        file_size = file_info['size']
+        part_size = min(parse_size(self.config.get('split_size', '1.5GB')), MAX_DOCUMENT_SIZE)
+        part_count = max(1, -(-file_size // part_size))
+        parts_dir = tempfile.mkdtemp(prefix='tg_split_')  # للبيان فقط
+        whole_hash = asyncio.ensure_future(asyncio.to_thread(hash_file_range, source_path))
+        progress = BATCH_PROGRESS.get()
+        
+        def propagate_retryable(keys: List[str]):
+            # فشل جزء أو البيان بخطأ مؤقت يضم الملف كاملاً لجولة الإعادة الأخيرة،
+            # والأجزاء المرفوعة سابقاً تُتخطى فيها عبر فهرس التكرار
+            if progress is not None and any(key in progress.retryable for key in keys):
+                progress.retryable.difference_update(keys)
+                progress.retryable.add(source_path)
+        
+        try:
+            if not self.headless and CURRENT_JOB.get() is None:
+                print(f"{Colors.CYAN}✂️ رفع {filename} على {part_count} أجزاء بحجم {self.format_size(part_size)}...{Colors.ENDC}")
+            
+            parts = []
+            for i in range(1, part_count + 1):
+                offset = (i - 1) * part_size
+                size = min(part_size, file_size - offset)
+                parts.append({
+                    'name': f"{filename}.{i:03d}",
+                    'path': f"{source_path}#{i:03d}",
+                    'source': source_path,
+                    'offset': offset,
+                    'size': size,
+                    'extension': f".{i:03d}",
+                    'upload_as': 'document',
+                    'caption': f"🧩 {filename}\n📦 جزء {i} من {part_count} ({self.format_size(size)})"
+                })
+            
+            results = await asyncio.gather(*(
+                self.upload_and_fan_out(part, chat_id, extra_chat_ids or [], i, part_count)
+                for i, part in enumerate(parts, 1)
+            ))
+            failed_parts = [part for part, (success, _) in zip(parts, results) if not success]
+            if failed_parts:
+                propagate_retryable([part['path'] for part in failed_parts])
+                names = ', '.join(part['name'] for part in failed_parts[:3])
+                return False, f"فشل رفع {len(failed_parts)} من أجزاء {filename}: {names}"
+            
+            # الأجزاء التي لم تُقرأ كاملة أثناء الرفع (تخطي التكرار مثلاً) تُحسب بصمتها الآن
+            for part in parts:
+                if not part.get('sha256'):
+                    part['sha256'] = await asyncio.to_thread(hash_file_range, source_path, part['offset'], part['size'])
+            
+            # بيان إعادة التجميع
+            manifest_path = os.path.join(parts_dir, f"{filename}.manifest.json")
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'filename': filename,
+                    'size': file_size,
+                    'sha256': await whole_hash,
+                    'parts': [{k: part[k] for k in ('name', 'size', 'sha256')} for part in parts]
+                }, f, ensure_ascii=False, indent=2)
+            
+            part_names = ' '.join(f'"{part["name"]}"' for part in parts)
+            manifest_info = {
+                'name': os.path.basename(manifest_path),
+                'path': manifest_path,
+                'size': os.path.getsize(manifest_path),
+                'extension': '.json',
+                'upload_as': 'document',
+                'caption': f"🧾 بيان {filename} ({len(parts)} جزء)\n🔧 cat {part_names} > \"{filename}\""
+            }
+            success, message = await self.upload_and_fan_out(
+                manifest_info, chat_id, extra_chat_ids or [], len(parts), len(parts)
+            )
+            if not success:
+                propagate_retryable([manifest_path])
+                return False, message
+            
+            return True, f"تم رفع {filename} بنجاح ({len(parts)} جزء)"
+            
+        except Exception as e:
+            error_msg = f"فشل تقسيم {filename}: {str(e)}"
+            logger.error(error_msg)
+            return False, error_msg
+        finally:
+            if not whole_hash.cancel() and not whole_hash.cancelled():
+                whole_hash.exception()  # قراءة الخطأ إن وُجد حتى لا يُسجل كاستثناء مهمل
+            shutil.rmtree(parts_dir, ignore_errors=True)
+    
+    def album_kind(self, file_info: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """نوع الملف داخل الألبوم ومجموعته التي يمكن خلطه معها
+        
+        الصور والفيديوهات تجتمع في ألبوم واحد، والوثائق مع الوثائق فقط، والصوتيات مع الصوتيات.
+        None للملفات التي تُرفع منفردة (تحتاج تقسيماً أو فرض نوع لا يناسبها).
+        """
+        if file_info['size'] > MAX_DOCUMENT_SIZE:
+            return None
+        ext = file_info.get('extension', '').lower()
+        file_type = self.file_kind(file_info)
+        upload_type = file_info.get('upload_as') or self.config.get('default_upload_type', 'auto')
+        if upload_type == 'document':
+            return 'document', 'document'
+        if file_type == 'video' and file_info['size'] <= self.max_video_size:
+            return 'video', 'visual'
+        if upload_type == 'video':
+            return None
+        if ext in PHOTO_EXTENSIONS and file_info['size'] <= MAX_PHOTO_SIZE:
+            return 'photo', 'visual'
+        if file_type == 'audio':
+            return 'audio', 'audio'
+        return 'document', 'document'
+    
+    def album_media(self, stack: contextlib.ExitStack, file_info: Dict[str, Any], media_type: str,
+                    caption: str, file_id: Optional[str] = None) -> Any:
+        """عنصر ألبوم من file_id محفوظ أو من الملف على القرص (بمساره في الوضع المحلي)"""
+        if file_id:
+            media = file_id
+        elif self.local_mode:
+            media = Path(file_info['path']).absolute()
+        else:
+            media = InputFile(stack.enter_context(open(file_info['path'], 'rb')),
+                              filename=file_info['name'], read_file_handle=False, attach=True)
+        
+        if media_type == 'photo':
+            return InputMediaPhoto(media, caption=caption)
+        if media_type == 'audio':
+            return InputMediaAudio(media, caption=caption)
+        if media_type == 'document':
+            return InputMediaDocument(media, caption=caption)
+        
+        video_kwargs = self.video_attributes(file_info.get('media_info'))
+        thumbnail_path = file_info.get('thumbnail_path')
+        if thumbnail_path and not file_id:
+            video_kwargs['thumbnail'] = (Path(thumbnail_path).absolute() if self.local_mode
+                                         else stack.enter_context(open(thumbnail_path, 'rb')))
+        return InputMediaVideo(media, caption=caption, supports_streaming=True, **video_kwargs)
+    
+    async def send_album(self, chat_id: str, entries: List[Dict[str, Any]]) -> Tuple[Any, ...]:
+        """إرسال عناصر الألبوم في طلب send_media_group واحد مع احترام حدود المعدل"""
+        upload_size = sum(entry['info']['size'] for entry in entries if not entry['file_id'])
+        
+        async def send_attempt():
+            with contextlib.ExitStack() as stack:
+                media = [
+                    self.album_media(stack, entry['info'], entry['media_type'], entry['caption'], entry['file_id'])
+                    for entry in entries
+                ]
+                return await self.bot.send_media_group(
+                    chat_id=chat_id,
+                    media=media,
+                    **self.request_timeouts(upload_size)
+                )
+        
+        return await self.call_with_rate_limit(chat_id, send_attempt)
+    
+    async def upload_album(self, items: List[Tuple[int, Dict[str, Any]]], chat_id: str,
+                           extra_chat_ids: List[str], total_num: int) -> List[Tuple[bool, str]]:
+        """رفع ملفات متوافقة كألبوم واحد ثم توزيعه على باقي القنوات عبر file_id
+        
+        items: (رقم الملف، معلوماته) بحد أقصى MAX_ALBUM_SIZE. الملفات المرفوعة مسبقاً تُتخطى
+        أو يُعاد استخدام file_id المحفوظ لها داخل الألبوم حسب dedup_mode.
+        النتائج تُعاد بنفس ترتيب items.
+        """
+        progress = BATCH_PROGRESS.get() or UploadProgress(
+            len(items), sum(info['size'] for _, info in items), self.render_progress
+        )
+        key = f"album:{items[0][1]['path']}"
+        began = time.monotonic()
+        dedup_mode = self.config.get('dedup_mode', 'skip')
+        results: List[Optional[Tuple[bool, str]]] = [None] * len(items)
+        entries = []
+        skipped = []
+        counted_bytes = 0  # بايتات الملفات التي يتولى الألبوم حسابها في التقدم
+        
+        try:
+            for index, (num, info) in enumerate(items):
+                media_type = self.album_kind(info)[0]
+                caption = self.build_caption(info, num, total_num)
+                fingerprint = file_id = None
+                if dedup_mode != 'off':
+                    fingerprint = await asyncio.to_thread(
+                        file_fingerprint, info['path'], info['size'], self.config.get('dedup_full_hash', False)
+                    )
+                    previous = self.store.find_upload(fingerprint, chat_id)
+                    if previous and dedup_mode == 'skip':
+                        self.remember_sent_media(info['path'], previous[1], previous[2], caption, fingerprint)
+                        results[index] = (True, f"⏭️ تم تخطي {info['name']} (مرفوع مسبقاً لهذه القناة)")
+                        skipped.append(index)
+                        counted_bytes += info['size']
+                        continue
+                    previous = previous or self.store.find_upload(fingerprint)
+                    if previous and previous[2] == media_type:
+                        file_id = previous[1]
+                entries.append({
+                    'index': index,
+                    'info': info,
+                    'media_type': media_type,
+                    'caption': caption,
+                    'fingerprint': fingerprint,
+                    'file_id': file_id
+                })
+            
+            # الألبوم يحتاج عنصرين على الأقل، والملف الوحيد المتبقي يُرفع بالطريقة العادية
+            if len(entries) == 1:
+                entry = entries.pop()
+                num, info = items[entry['index']]
+                results[entry['index']] = await self.upload_and_fan_out(info, chat_id, extra_chat_ids, num, total_num)
+            
+            if entries:
+                upload_size = sum(entry['info']['size'] for entry in entries if not entry['file_id'])
+                counted_bytes += sum(entry['info']['size'] for entry in entries)
+                progress.start_file(key, upload_size)
+                started = time.monotonic()
+                token = UPLOAD_PROGRESS.set(lambda count: progress.add_bytes(key, count))
+                try:
+                    async with self.upload_slot():
+                        messages = await self.send_album(chat_id, entries)
+                finally:
+                    UPLOAD_PROGRESS.reset(token)
+                
+                if self.local_mode:
+                    progress.add_bytes(key, upload_size)
+                speed = upload_size / max(time.monotonic() - started, 1e-6)
+                
+                for entry, message in zip(entries, messages):
+                    info = entry['info']
+                    uploaded = self.extract_file_id(message)
+                    if uploaded:
+                        self.remember_sent_media(info['path'], uploaded[0], uploaded[1], entry['caption'], entry['fingerprint'])
+                        if entry['fingerprint']:
+                            self.store.record_upload(entry['fingerprint'], chat_id, *uploaded)
+                    self.upload_history.append({
+                        'filename': info['name'],
+                        'size': info['size'],
+                        'chat_id': chat_id,
+                        'timestamp': time.time(),
+                        'success': True,
+                        'album': True,
+                        'duration': time.monotonic() - began
+                    })
+                    if entry['file_id']:
+                        message_text = f"♻️ تم إرسال {info['name']} ضمن ألبوم من file_id محفوظ دون إعادة رفع"
+                    else:
+                        message_text = f"تم رفع {info['name']} ضمن ألبوم من {len(entries)} ملف ({self.format_size(int(speed))}/s)"
+                    results[entry['index']] = (True, message_text)
+                
+                if extra_chat_ids:
+                    failed = [msg for ok, msg in await self.fan_out_album([e['info'] for e in entries], extra_chat_ids) if not ok]
+                    if failed:
+                        for entry in entries:
+                            _, message = results[entry['index']]
+                            results[entry['index']] = (False, f"{message} لكن فشل التوزيع على {len(failed)} قناة: {failed[0]}")
+                    else:
+                        for entry in entries:
+                            _, message = results[entry['index']]
+                            results[entry['index']] = (True, f"{message} (+{len(extra_chat_ids)} قناة عبر file_id)")
+            
+            # الملفات المتخطاة تُوزع فقط على القنوات الإضافية التي لم تصلها بعد
+            if extra_chat_ids:
+                for index in skipped:
+                    info = items[index][1]
+                    failed = [msg for ok, msg in await self.fan_out(info, extra_chat_ids) if not ok]
+                    if failed:
+                        results[index] = (False, f"{results[index][1]} لكن فشل التوزيع على {len(failed)} قناة: {failed[0]}")
+            
+            return results
+        
+        except Exception as e:
+            transient = is_transient_error(e)
+            for entry in entries:
+                info = entry['info']
+                error_msg = f"فشل رفع {info['name']} ضمن ألبوم: {str(e)}"
+                if transient:
+                    progress.retryable.add(info['path'])
+                self.upload_history.append({
+                    'filename': info['name'],
+                    'size': info['size'],
+                    'chat_id': chat_id,
+                    'timestamp': time.time(),
+                    'success': False,
+                    'error': str(e),
+                    'transient': transient,
+                    'album': True,
+                    'duration': time.monotonic() - began
+                })
+                results[entry['index']] = (False, error_msg)
+            logger.error(f"فشل رفع ألبوم من {len(entries)} ملف إلى {chat_id}: {e}")
+            return [result or (False, f"فشل رفع {info['name']}: {str(e)}") for result, (_, info) in zip(results, items)]
+        
+        finally:
+            progress.end_file(key, counted_bytes)
+    
+    async def fan_out_album(self, files: List[Dict[str, Any]], chat_ids: List[str]) -> List[Tuple[bool, str]]:
+        """إعادة إرسال ألبوم مرفوع إلى قنوات إضافية عبر file_id مع الحفاظ على تجميعه
+
+        العناصر التي وصلت القناة سابقاً تُستبعد منها حسب dedup_mode.
+        """
+        sent = [self.sent_media.get(file_info['path']) for file_info in files]
+        if not all(sent):
+            return [(False, "لا يوجد file_id محفوظ لكل عناصر الألبوم") for _ in chat_ids]
+        
+        async def send_to(chat_id: str) -> Tuple[bool, str]:
+            pending = [(file_info, item) for file_info, item in zip(files, sent) if not self.already_sent(item, chat_id)]
+            if not pending:
+                return True, f"⏭️ تم تخطي الألبوم في {chat_id} (مرفوع مسبقاً لهذه القناة)"
+            entries = [
+                {'info': file_info, 'media_type': item['media_type'], 'caption': item['caption'], 'file_id': item['file_id']}
+                for file_info, item in pending
+            ]
+            try:
+                if len(entries) == 1:
+                    # الألبوم يحتاج عنصرين على الأقل
+                    entry = entries[0]
+                    await self.call_with_rate_limit(
+                        chat_id,
+                        lambda: self.send_by_type(chat_id, entry['file_id'], entry['media_type'], entry['caption'])
+                    )
+                else:
+                    await self.send_album(chat_id, entries)
+                for _, item in pending:
+                    if item['fingerprint']:
+                        self.store.record_upload(item['fingerprint'], chat_id, item['file_id'], item['media_type'])
+                return True, f"تم إرسال الألبوم إلى {chat_id}"
+            except Exception as e:
+                error_msg = f"فشل إرسال الألبوم إلى {chat_id}: {str(e)}"
+                logger.error(error_msg)
+                return False, error_msg
+        
+        return list(await asyncio.gather(*(send_to(chat_id) for chat_id in chat_ids)))
+    
+    async def upload_batch(self, files: List[Dict[str, Any]], chat_id: str,
+                           extra_chat_ids: Optional[List[str]] = None,
+                           stats: Optional[Dict[str, int]] = None,
+                           album_mode: Optional[bool] = None) -> List[Tuple[bool, str]]:
+        """رفع مجموعة ملفات بالتوازي مع حد أقصى لعدد الرفعات الجارية
+
+        كل ملف يُرفع مرة واحدة إلى chat_id ثم يُعاد إرساله عبر file_id إلى extra_chat_ids.
+        في وضع الألبومات تُجمع الملفات المتوافقة في طلبات send_media_group فور تجهيزها.
+        الملفات التي فشلت بخطأ مؤقت تُعاد محاولتها مرة أخيرة بعد انتهاء الدفعة.
+        النتائج تُعاد بنفس ترتيب الملفات المُدخلة بغض النظر عن ترتيب الانتهاء،
+        وإحصاءات إعادة المحاولة تُكتب في stats إن مُرر.
+        داخل مهمة خلفية يُسجل التقدم وأسطر النتائج في المهمة بدل طباعتها.
+        """
+        total = len(files)
+        job = CURRENT_JOB.get()
+        if album_mode is None:
+            album_mode = self.config.get('album_mode', False)
+        extra_chat_ids = extra_chat_ids or []
+        all_chat_ids = [chat_id] + extra_chat_ids
+        for target in all_chat_ids:
+            self.store.enqueue(files, target)
+        upload_infos = list(files)
+        
+        # النسخ المضغوطة التي لم يكتمل رفعها محدودة بعدد الرفعات المتزامنة + 1، فيُضغط
+        # الملف التالي أثناء رفع الحالي دون أن تتراكم نسخ الدفعة كلها على القرص.
+        # الألبوم يحتاج حتى MAX_ALBUM_SIZE ملفاً جاهزاً قبل رفعه
+        lookahead_size = max(1, int(self.config.get('upload_workers', 3))) + 1
+        if album_mode:
+            lookahead_size = max(lookahead_size, MAX_ALBUM_SIZE)
+        lookahead = asyncio.Semaphore(lookahead_size)
+        pinned = {}  # رقم الملف -> معلومات نسخته المضغوطة المنتظرة للرفع
+        
+        async def prepare(index: int, file_info: Dict[str, Any]) -> Dict[str, Any]:
+            if not self.should_transcode(file_info):
+                return await self.prepare_upload(file_info)
+            await lookahead.acquire()
+            upload_info = None
+            try:
+                upload_info = await self.prepare_upload(file_info)
+                return upload_info
+            finally:
+                if upload_info is not None and 'source_path' in upload_info:
+                    pinned[index] = upload_info
+                else:
+                    lookahead.release()
+        
+        def release(index: int):
+            upload_info = pinned.pop(index, None)
+            if upload_info is not None:
+                self.release_transcode(upload_info)
+                lookahead.release()
+        
+        async def worker(num: int, file_info: Dict[str, Any], prepared: asyncio.Future) -> Tuple[bool, str]:
+            upload_info = await prepared
+            upload_infos[num - 1] = upload_info
+            progress.total_bytes += upload_info['size'] - file_info['size']
+            return await upload_one(num, file_info, upload_info)
+        
+        async def upload_one(num: int, file_info: Dict[str, Any], upload_info: Dict[str, Any]) -> Tuple[bool, str]:
+            if self.needs_split(upload_info):
+                success, message = await self.upload_split_file(upload_info, chat_id, extra_chat_ids)
+            else:
+                success, message = await self.upload_and_fan_out(upload_info, chat_id, extra_chat_ids, num, total)
+            return report(num, file_info, success, message)
+        
+        async def upload_group(group: List[int]) -> List[Tuple[int, Tuple[bool, str]]]:
+            if len(group) == 1:
+                return [(group[0], await upload_one(group[0] + 1, files[group[0]], upload_infos[group[0]]))]
+            group_results = await self.upload_album(
+                [(i + 1, upload_infos[i]) for i in group], chat_id, extra_chat_ids, total
+            )
+            return [(i, report(i + 1, files[i], *result)) for i, result in zip(group, group_results)]
+        
+        async def upload_albums() -> List[Tuple[bool, str]]:
+            # كل ملف يُضاف لمجموعته فور تجهيزه، والمجموعة الممتلئة تبدأ رفعها دون انتظار الباقي
+            tasks = []
+            buckets = {}
+            try:
+                for i, (file_info, task) in enumerate(zip(files, prepared)):
+                    upload_info = await task
+                    upload_infos[i] = upload_info
+                    progress.total_bytes += upload_info['size'] - file_info['size']
+                    kind = None if self.needs_split(upload_info) else self.album_kind(upload_info)
+                    if kind is None:
+                        tasks.append(asyncio.ensure_future(upload_group([i])))
+                        continue
+                    bucket = buckets.setdefault(kind[1], [])
+                    bucket.append(i)
+                    if len(bucket) == MAX_ALBUM_SIZE:
+                        tasks.append(asyncio.ensure_future(upload_group(buckets.pop(kind[1]))))
+                tasks.extend(asyncio.ensure_future(upload_group(group)) for group in buckets.values())
+                
+                album_results = [None] * total
+                for group_results in await asyncio.gather(*tasks):
+                    for i, result in group_results:
+                        album_results[i] = result
+                return album_results
+            finally:
+                for task in tasks:
+                    task.cancel()
+        
+        def report(num: int, file_info: Dict[str, Any], success: bool, message: str) -> Tuple[bool, str]:
+            # النسخة المضغوطة تبقى محجوزة فقط إن كانت ستُعاد محاولتها في الجولة الأخيرة
+            if success or upload_infos[num - 1]['path'] not in progress.retryable:
+                release(num - 1)
+            for target in all_chat_ids:
+                if success:
+                    self.store.mark(file_info['path'], target, 'done')
+                else:
+                    self.store.mark(file_info['path'], target, 'failed', message)
+            
+            if self.headless:
+                self.emit_event('file', index=num, path=file_info['path'], success=success, message=message)
+            elif success:
+                self.batch_message(f"{Colors.GREEN}✅ {message}{Colors.ENDC}")
+            else:
+                self.batch_message(f"{Colors.FAIL}❌ {message}{Colors.ENDC}")
+            progress.file_completed(success)
+            return success, message
+        
+        progress = UploadProgress(total, sum(f['size'] for f in files),
+                                  self.render_progress if job is None else lambda progress: None)
+        if job is not None:
+            job.progress = progress
+        token = BATCH_PROGRESS.set(progress)
+        prepared = [asyncio.ensure_future(prepare(i, f)) for i, f in enumerate(files)]
+        try:
+            if album_mode:
+                results = await upload_albums()
+            else:
+                results = list(await asyncio.gather(*(
+                    worker(i, f, task) for i, (f, task) in enumerate(zip(files, prepared), 1)
+                )))
+            
+            # جولة أخيرة للملفات التي فشلت بخطأ مؤقت بعد أن هدأت الشبكة
+            retry_indexes = [
+                i for i, (success, _) in enumerate(results)
+                if not success and upload_infos[i]['path'] in progress.retryable
+            ]
+            recovered = 0
+            if retry_indexes:
+                if self.headless:
+                    self.emit_event('retry_pass', files=len(retry_indexes))
+                else:
+                    self.batch_message(f"{Colors.WARNING}🔁 إعادة محاولة {len(retry_indexes)} ملف فشل بخطأ مؤقت...{Colors.ENDC}")
+                await asyncio.sleep(backoff_delay(
+                    int(self.config.get('network_retries', 3)),
+                    float(self.config.get('retry_backoff', 1.0)),
+                    float(self.config.get('retry_backoff_max', 30.0))
+                ))
+                for i in retry_indexes:
+                    progress.retry_file(upload_infos[i]['path'], upload_infos[i]['size'])
+                retried = await asyncio.gather(*(
+                    upload_one(i + 1, files[i], upload_infos[i]) for i in retry_indexes
+                ))
+                for i, result in zip(retry_indexes, retried):
+                    results[i] = result
+                recovered = sum(1 for success, _ in retried if success)
+            
+            if stats is not None:
+                stats.update(retries=progress.retries, retried_files=len(retry_indexes), recovered_files=recovered)
+            return results
+        finally:
+            for task in prepared:
+                if not task.cancel() and not task.cancelled():
+                    task.exception()  # قراءة الخطأ إن وُجد حتى لا يُسجل كاستثناء مهمل
+            for index in list(pinned):
+                release(index)
+            BATCH_PROGRESS.reset(token)
+            self.store.flush()
+            if not self.headless and job is None:
+                print()
+    
+    def batch_message(self, line: str):
+        """طباعة سطر نتيجة أثناء الرفع، أو حفظه في سجل المهمة إن كان الرفع في الخلفية"""
+        job = CURRENT_JOB.get()
+        if job is not None:
+            job.messages.append(line)
+        else:
+            print(f"\r\033[K{line}")
+    
+    async def run_upload_job(self, job: UploadJob):
+        """تنفيذ مهمة رفع من طابور الخلفية"""
+        try:
+            job.results = await self.upload_batch(
+                job.files, job.chat_ids[0], job.chat_ids[1:], job.stats, album_mode=job.album_mode
+            )
+        except asyncio.CancelledError:
+            if job.cancel_requested:
+                self.store.cancel_pending(job.files, job.chat_ids)
+            raise
+    
+    async def offer_resume(self) -> bool:
+        """عرض استئناف الرفعات غير المكتملة من جلسة سابقة"""
+        if self.job_manager.busy:
+            return False  # الملفات pending الآن تخص مهام هذه الجلسة
+        unfinished = self.store.unfinished()
+        if not unfinished:
+            return False
+        
+        self.print_header("استئناف الرفع")
+        print(f"{Colors.WARNING}♻️ توجد {len(unfinished)} ملفات لم يكتمل رفعها في جلسة سابقة{Colors.ENDC}")
+        answer = (await self.ask(f"{Colors.GREEN}🔁 استئناف رفعها؟ (y = استئناف، n = تجاهلها): {Colors.ENDC}")).strip().lower()
+        if answer != 'y':
+            self.store.discard_unfinished()
+            return False
+        
+        # تجميع الملفات حسب القناة مع تجاهل ما تغير أو حُذف منذ الجلسة السابقة
+        by_chat = {}
+        for job in unfinished:
+            file_info = self.build_file_info(job['path'])
+            if not file_info or file_info['size'] != job['size'] or file_info['date'] != job['mtime']:
+                self.store.mark(job['path'], job['chat_id'], 'failed', "تغير الملف أو حُذف منذ الجلسة السابقة")
+                continue
+            by_chat.setdefault(job['chat_id'], []).append(file_info)
+        self.store.flush()
+        
+        for chat_id, files in by_chat.items():
+            job = self.job_manager.submit(files, [chat_id], self.config.get('album_mode', False))
+            print(f"{Colors.GREEN}📤 أضيفت المهمة #{job.id}: استئناف رفع {len(files)} ملف إلى {chat_id}{Colors.ENDC}")
+        
+        await self.pause()
+        return True
+    
     async def upload_selected_files(self):
         """رفع الملفات المختارة بشكل متقدم"""
+        if await self.offer_resume():
+            return
+        
         if not self.selected_files:
             print(f"{Colors.FAIL}❌ لا توجد ملفات مختارة!{Colors.ENDC}")
-            input(f"\n{Colors.GREEN}⏎ اضغط Enter للمتابعة...{Colors.ENDC}")
+            await self.pause()
             return
         
         # عرض ملخص الملفات
@@ -597,13 +3382,16 @@ class TelegramVideoUploader:
         self.display_selected_files()
         
         # اختيار القناة
-        selected_channel = await self.display_channels_interactive()
-        if not selected_channel:
+        selected_channels = await self.display_channels_interactive()
+        if not selected_channels:
             print(f"{Colors.FAIL}❌ لم يتم اختيار قناة!{Colors.ENDC}")
-            input(f"\n{Colors.GREEN}⏎ اضغط Enter للمتابعة...{Colors.ENDC}")
+            await self.pause()
             return
         
-        print(f"{Colors.GREEN}✅ تم اختيار القناة: {selected_channel['title']}{Colors.ENDC}")
+        titles = '، '.join(channel['title'] for channel in selected_channels)
+        print(f"{Colors.GREEN}✅ تم اختيار {len(selected_channels)} قناة: {titles}{Colors.ENDC}")
+        if len(selected_channels) > 1:
+            print(f"{Colors.CYAN}📡 سيُرفع كل ملف مرة واحدة ثم يُعاد إرساله لباقي القنوات عبر file_id{Colors.ENDC}")
         
         # اختيار نوع الرفع
         upload_type = self.config.get('default_upload_type', 'auto')
@@ -612,57 +3400,36 @@ class TelegramVideoUploader:
         else:
             print(f"{Colors.CYAN}📤 سيتم رفع الملفات كـ {upload_type}{Colors.ENDC}")
         
+        # وضع الألبومات
+        if len(self.selected_files) > 1:
+            current = 'y' if self.config.get('album_mode', False) else 'n'
+            answer = (await self.ask(f"{Colors.GREEN}📚 تجميع الصور والفيديوهات والوثائق في ألبومات (حتى {MAX_ALBUM_SIZE} في الطلب)؟ "
+                                     f"(y/n) [{current}]: {Colors.ENDC}")).strip().lower()
+            if answer in ('y', 'n'):
+                self.config['album_mode'] = answer == 'y'
+        
         # تأكيد الرفع
-        confirm = input(f"\n{Colors.GREEN}🚀 رفع {len(self.selected_files)} ملف؟ (y/n): {Colors.ENDC}").strip().lower()
+        confirm = (await self.ask(f"\n{Colors.GREEN}🚀 رفع {len(self.selected_files)} ملف؟ (y/n): {Colors.ENDC}")).strip().lower()
         if confirm != 'y':
             print(f"{Colors.FAIL}❌ تم إلغاء الرفع!{Colors.ENDC}")
-            input(f"\n{Colors.GREEN}⏎ اضغط Enter للمتابعة...{Colors.ENDC}")
+            await self.pause()
             return
         
-        # بدء الرفع
-        print(f"\n{Colors.CYAN}🚀 بدء رفع {len(self.selected_files)} ملف...{Colors.ENDC}")
-        print(f"{Colors.BLUE}{'=' * 60}{Colors.ENDC}")
-        
-        success_count = 0
-        failed_files = []
-        
-        for i, file_info in enumerate(self.selected_files, 1):
-            success, message = await self.upload_file(
-                file_info, 
-                selected_channel['id'], 
-                i, 
-                len(self.selected_files)
-            )
-            
-            if success:
-                success_count += 1
-                print(f"{Colors.GREEN}✅ {message}{Colors.ENDC}")
-            else:
-                failed_files.append(file_info['name'])
-                print(f"{Colors.FAIL}❌ {message}{Colors.ENDC}")
-            
-            # توقف بين الرفعات
-            if i < len(self.selected_files):
-                delay = self.config.get('upload_delay', 2)
-                print(f"{Colors.CYAN}⏳ انتظار {delay} ثانية...{Colors.ENDC}")
-                await asyncio.sleep(delay)
-        
-        # عرض النتائج
-        print(f"{Colors.BLUE}{'=' * 60}{Colors.ENDC}")
-        print(f"{Colors.GREEN}🎉 انتهت عملية الرفع!{Colors.ENDC}")
-        print(f"{Colors.GREEN}✅ نجح: {success_count}/{len(self.selected_files)}{Colors.ENDC}")
-        
-        if failed_files:
-            print(f"{Colors.FAIL}❌ فشل في رفع: {', '.join(failed_files[:3])}{Colors.ENDC}")
-            if len(failed_files) > 3:
-                print(f"{Colors.FAIL}    و {len(failed_files) - 3} ملف آخر...{Colors.ENDC}")
-        
-        input(f"\n{Colors.GREEN}⏎ اضغط Enter للمتابعة...{Colors.ENDC}")
+        # إضافة الرفع إلى طابور الخلفية ومتابعة التصفح
+        files = list(self.selected_files)
+        chat_ids = [channel['id'] for channel in selected_channels]
+        job = self.job_manager.submit(files, chat_ids, self.config.get('album_mode', False))
+        self.selected_files.clear()
+        ahead = sum(1 for other in self.job_manager.jobs if other is not job and not other.finished)
+        print(f"\n{Colors.GREEN}📤 أضيفت المهمة #{job.id}: {len(files)} ملف ({self.format_size(job.total_size)})"
+              f"{f'، قبلها {ahead} مهمة' if ahead else ''}{Colors.ENDC}")
+        print(f"{Colors.CYAN}ℹ️ يمكنك متابعة التصفح، و 'j' لمتابعة المهام{Colors.ENDC}")
+        await asyncio.sleep(1)
     
-    def display_file_info(self, file_path: str):
+    async def display_file_info(self, file_path: str):
         """عرض معلومات مفصلة عن ملف"""
         try:
-            file_stat = os.stat(file_path)
+            file_stat = await asyncio.to_thread(os.stat, file_path)
             filename = os.path.basename(file_path)
             file_ext = os.path.splitext(filename)[1].lower()
             file_size = file_stat.st_size
@@ -674,51 +3441,33 @@ class TelegramVideoUploader:
             print(f"{Colors.CYAN}📂 المسار: {Colors.ENDC}{file_path}")
             print(f"{Colors.CYAN}📏 الحجم: {Colors.ENDC}{self.format_size(file_size)}")
             print(f"{Colors.CYAN}📅 تاريخ التعديل: {Colors.ENDC}{file_date.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"{Colors.CYAN}🔍 النوع: {Colors.ENDC}{self.get_file_type(file_ext)}")
+            file_type = self.file_kind({'path': file_path, 'extension': file_ext, 'date': file_stat.st_mtime})
+            print(f"{Colors.CYAN}🔍 النوع: {Colors.ENDC}{FILE_TYPE_NAMES.get(file_type, 'ملف')}")
             
-            # معلومات إضافية للفيديو
-            if file_ext in VIDEO_EXTENSIONS:
+            # معلومات إضافية للفيديو (من الذاكرة المؤقتة أو من عمال الفحص)
+            if file_type == 'video':
                 try:
-                    import subprocess
-                    result = subprocess.run(
-                        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=width,height,duration', '-of', 'csv=s=x:p=0', file_path],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True
-                    )
-                    if result.returncode == 0:
-                        info = result.stdout.strip().split(',')
-                        if len(info) >= 3:
-                            width, height, duration = info[0], info[1], float(info[2])
-                            print(f"{Colors.CYAN}🎬 أبعاد الفيديو: {Colors.ENDC}{width}x{height}")
-                            print(f"{Colors.CYAN}⏱️ المدة: {Colors.ENDC}{int(duration//60):02d}:{int(duration%60):02d}")
+                    key = (file_path, file_size, file_stat.st_mtime)
+                    info = self.cached_media_info(key)
+                    if info is None:
+                        info = await asyncio.wait_for(asyncio.wrap_future(self.submit_probe(key)), timeout=30)
+                        self.persist_media_info()
+                    if info and info.get('width'):
+                        duration = info.get('duration', 0)
+                        print(f"{Colors.CYAN}🎬 أبعاد الفيديو: {Colors.ENDC}{info['width']}x{info['height']}")
+                        print(f"{Colors.CYAN}⏱️ المدة: {Colors.ENDC}{int(duration//60):02d}:{int(duration%60):02d}")
+                        if info.get('codec'):
+                            print(f"{Colors.CYAN}🎞️ الترميز: {Colors.ENDC}{info['codec']}")
                 except Exception:
                     pass
             
-            input(f"\n{Colors.GREEN}⏎ اضغط Enter للمتابعة...{Colors.ENDC}")
+            await self.pause()
             
         except Exception as e:
             print(f"{Colors.FAIL}❌ خطأ في عرض معلومات الملف: {e}{Colors.ENDC}")
-            input(f"\n{Colors.GREEN}⏎ اضغط Enter للمتابعة...{Colors.ENDC}")
-    
-    def get_file_type(self, extension: str) -> str:
-        """الحصول على نوع الملف حسب الامتداد"""
-        if extension in VIDEO_EXTENSIONS:
-            return "فيديو"
-        elif extension in AUDIO_EXTENSIONS:
-            return "صوت"
-        elif extension in IMAGE_EXTENSIONS:
-            return "صورة"
-        elif extension in DOCUMENT_EXTENSIONS:
-            return "وثيقة"
-        elif extension in ARCHIVE_EXTENSIONS:
-            return "أرشيف"
-        elif extension in CODE_EXTENSIONS:
-            return "كود"
-        else:
-            return "ملف"
+            await self.pause()
     
-    def manage_bookmarks(self):
+    async def manage_bookmarks(self):
         """إدارة الإشارات المرجعية"""
         while True:
             self.print_header("إدارة الإشارات المرجعية")
@@ -742,49 +3491,236 @@ class TelegramVideoUploader:
             print(f"{Colors.GREEN}g + رقم     : {Colors.ENDC}الذهاب إلى الإشارة المرجعية")
             print(f"{Colors.GREEN}q           : {Colors.ENDC}خروج")
             
-            command = input(f"\n{Colors.GREEN}💻 أدخل الأمر: {Colors.ENDC}").strip().lower()
+            command = (await self.ask(f"\n{Colors.GREEN}💻 أدخل الأمر: {Colors.ENDC}")).strip().lower()
             
             if command == 'q':
                 break
             elif command == 'a':
-                name = input(f"{Colors.GREEN}📌 اسم الإشارة المرجعية: {Colors.ENDC}").strip()
+                name = (await self.ask(f"{Colors.GREEN}📌 اسم الإشارة المرجعية: {Colors.ENDC}")).strip()
                 if name:
                     self.bookmarks.append({
                         'name': name,
                         'path': self.current_path
                     })
                     print(f"{Colors.GREEN}✅ تمت إضافة الإشارة المرجعية!{Colors.ENDC}")
-                    time.sleep(1)
+                    await asyncio.sleep(1)
             elif command.startswith('d '):
                 try:
                     bookmark_num = int(command.split()[1])
                     if 1 <= bookmark_num <= len(self.bookmarks):
                         del self.bookmarks[bookmark_num - 1]
                         print(f"{Colors.GREEN}✅ تم حذف الإشارة المرجعية!{Colors.ENDC}")
-                        time.sleep(1)
+                        await asyncio.sleep(1)
                     else:
                         print(f"{Colors.FAIL}❌ رقم غير صحيح!{Colors.ENDC}")
-                        time.sleep(1)
+                        await asyncio.sleep(1)
                 except (ValueError, IndexError):
                     print(f"{Colors.FAIL}❌ استخدم: d رقم_الإشارة{Colors.ENDC}")
-                    time.sleep(1)
+                    await asyncio.sleep(1)
             elif command.startswith('g '):
                 try:
                     bookmark_num = int(command.split()[1])
                     if 1 <= bookmark_num <= len(self.bookmarks):
                         self.current_path = self.bookmarks[bookmark_num - 1]['path']
                         print(f"{Colors.GREEN}✅ تم الانتقال إلى الإشارة المرجعية!{Colors.ENDC}")
-                        time.sleep(1)
+                        await asyncio.sleep(1)
                         break
                     else:
                         print(f"{Colors.FAIL}❌ رقم غير صحيح!{Colors.ENDC}")
-                        time.sleep(1)
+                        await asyncio.sleep(1)
                 except (ValueError, IndexError):
                     print(f"{Colors.FAIL}❌ استخدم: g رقم_الإشارة{Colors.ENDC}")
-                    time.sleep(1)
+                    await asyncio.sleep(1)
+            else:
+                print(f"{Colors.FAIL}❌ أمر غير مفهوم!{Colors.ENDC}")
+                await asyncio.sleep(1)
+    
+    def display_job(self, job: UploadJob, show_messages: bool = False):
+        """سطر حالة مهمة رفع مع آخر نتائجها عند الطلب"""
+        icons = {'queued': "⏳", 'running': "🚀", 'done': "✅", 'failed': "❌", 'cancelled': "🚫"}
+        icon = "⏸️" if job.paused and not job.finished else icons[job.status]
+        line = f"#{job.id:<3} {icon} {len(job.files)} ملف ({self.format_size(job.total_size)})"
+        progress = job.progress
+        if progress is not None:
+            line += f" | 📦 {progress.completed_files}/{progress.total_files}"
+            if job.status == 'running':
+                percent = min(progress.processed_bytes / progress.total_bytes * 100, 100) if progress.total_bytes else 100
+                eta = progress.eta
+                eta_str = f"{int(eta // 60):02d}:{int(eta % 60):02d}" if eta is not None else "--:--"
+                line += (f" {percent:.0f}% ⚡ {self.format_size(int(progress.current_speed))}/s"
+                         f" (متوسط {self.format_size(int(progress.average_speed))}/s) ⏱️ {eta_str}")
+        if job.failed_count:
+            line += f" | ❌ {job.failed_count}"
+        if not job.finished:
+            line += f" | أولوية {job.priority}"
+        line += f" → {', '.join(map(str, job.chat_ids))}"
+        print(line)
+        
+        if job.finished and job.results:
+            # ملخص المهمة المنتهية: النجاح والسرعة المتوسطة وإعادات المحاولة
+            success_count = len(job.results) - job.failed_count
+            summary = f"      {Colors.GREEN}✅ نجح: {success_count}/{len(job.results)}"
+            if progress is not None:
+                summary += f" | ⚡ متوسط {self.format_size(int(progress.average_speed))}/s"
+            print(summary + Colors.ENDC)
+            if job.stats.get('retries') or job.stats.get('retried_files'):
+                print(f"      {Colors.WARNING}🔁 إعادات المحاولة: {job.stats.get('retries', 0)} طلب، "
+                      f"وأُعيد رفع {job.stats.get('retried_files', 0)} ملف في الجولة الأخيرة "
+                      f"(نجح منها {job.stats.get('recovered_files', 0)}){Colors.ENDC}")
+        if show_messages:
+            for message in list(job.messages)[-5:]:
+                print(f"      {message}")
+    
+    async def manage_jobs(self):
+        """إدارة مهام الرفع في الخلفية"""
+        manager = self.job_manager
+        while True:
+            self.print_header("مهام الرفع في الخلفية")
+            print(f"{Colors.CYAN}{self.jobs_status_line()}{Colors.ENDC}")
+            print(f"{Colors.BLUE}{'=' * 60}{Colors.ENDC}")
+            
+            if not manager.jobs:
+                print(f"{Colors.WARNING}📭 لا توجد مهام!{Colors.ENDC}")
+            for job in manager.jobs:
+                self.display_job(job, show_messages=job.status in ('running', 'failed'))
+            print(f"{Colors.BLUE}{'=' * 60}{Colors.ENDC}")
+            
+            print(f"{Colors.CYAN}🔧 الأوامر:{Colors.ENDC}")
+            print(f"{Colors.GREEN}Enter       : {Colors.ENDC}تحديث العرض")
+            print(f"{Colors.GREEN}p + رقم     : {Colors.ENDC}إيقاف مؤقت/استئناف المهمة")
+            print(f"{Colors.GREEN}x + رقم     : {Colors.ENDC}إلغاء المهمة")
+            print(f"{Colors.GREEN}+ رقم / - رقم: {Colors.ENDC}رفع/خفض أولوية مهمة منتظرة")
+            print(f"{Colors.GREEN}d           : {Colors.ENDC}حذف المهام المنتهية من القائمة")
+            print(f"{Colors.GREEN}q           : {Colors.ENDC}رجوع")
+            
+            command = (await self.ask(f"\n{Colors.GREEN}💻 أدخل الأمر: {Colors.ENDC}")).strip().lower()
+            
+            if command == 'q':
+                break
+            elif command == '':
+                continue
+            elif command == 'd':
+                removed = manager.clear_finished()
+                print(f"{Colors.GREEN}✅ تم حذف {removed} مهمة منتهية{Colors.ENDC}")
+                await asyncio.sleep(1)
+            elif command[:1] in ('p', 'x', '+', '-'):
+                try:
+                    job = manager.get(int(command[1:].strip()))
+                except ValueError:
+                    job = None
+                if job is None:
+                    print(f"{Colors.FAIL}❌ رقم مهمة غير صحيح!{Colors.ENDC}")
+                elif job.finished:
+                    print(f"{Colors.FAIL}❌ المهمة #{job.id} منتهية!{Colors.ENDC}")
+                elif command[0] == 'p':
+                    if job.paused:
+                        manager.resume(job)
+                        print(f"{Colors.GREEN}▶️ تم استئناف المهمة #{job.id}{Colors.ENDC}")
+                    else:
+                        manager.pause(job)
+                        print(f"{Colors.GREEN}⏸️ تم إيقاف المهمة #{job.id} (الملفات الجارية ستكتمل){Colors.ENDC}")
+                elif command[0] == 'x':
+                    manager.cancel(job)
+                    print(f"{Colors.GREEN}🚫 تم إلغاء المهمة #{job.id}{Colors.ENDC}")
+                else:
+                    manager.set_priority(job, job.priority + (-1 if command[0] == '+' else 1))
+                    print(f"{Colors.GREEN}📊 أولوية المهمة #{job.id}: {job.priority}{Colors.ENDC}")
+                await asyncio.sleep(1)
             else:
                 print(f"{Colors.FAIL}❌ أمر غير مفهوم!{Colors.ENDC}")
-                time.sleep(1)
+                await asyncio.sleep(1)
+    
+    def collect_files(self, patterns: List[str], recursive: bool = False) -> List[Dict[str, Any]]:
+        """تحويل مسارات وأنماط glob ومجلدات إلى قائمة ملفات بدون تكرار"""
+        paths = []
+        for pattern in patterns:
+            pattern = os.path.expanduser(pattern)
+            if os.path.isdir(pattern):
+                if recursive:
+                    for dirpath, _, filenames in os.walk(pattern):
+                        paths.extend(os.path.join(dirpath, name) for name in sorted(filenames))
+                else:
+                    paths.extend(entry.path for entry in sorted(os.scandir(pattern), key=lambda e: e.name) if entry.is_file())
+            else:
+                paths.extend(sorted(glob.glob(pattern, recursive=recursive)))
+        
+        files = []
+        for path in dict.fromkeys(os.path.abspath(path) for path in paths):
+            file_info = self.build_file_info(path)
+            if file_info and os.path.isfile(path):
+                files.append(file_info)
+        return files
+    
+    async def run_headless(self, patterns: List[str], chat_ids: List[str], recursive: bool = False) -> int:
+        """رفع دون واجهة تفاعلية مع تقدم بصيغة JSON lines
+
+        رمز الخروج: 0 عند نجاح الكل، 1 عند فشل بعض الملفات، 2 إذا لم توجد ملفات.
+        """
+        self.headless = True
+        files = self.collect_files(patterns, recursive)
+        if not files:
+            self.emit_event('error', message="لم يتم العثور على ملفات مطابقة", patterns=patterns)
+            return 2
+        
+        self.emit_event(
+            'start',
+            files=len(files),
+            bytes=sum(f['size'] for f in files),
+            chats=chat_ids,
+            workers=max(1, int(self.config.get('upload_workers', 3)))
+        )
+        stats = {}
+        results = await self.upload_batch(files, chat_ids[0], chat_ids[1:], stats)
+        failed = sum(1 for success, _ in results if not success)
+        self.emit_event('done', files=len(files), succeeded=len(files) - failed, failed=failed, **stats)
+        return 1 if failed else 0
+    
+    async def run_watch(self, directory: str, chat_ids: List[str], recursive: bool = False) -> int:
+        """مراقبة مجلد ورفع الملفات الجديدة فور اكتمال كتابتها"""
+        self.headless = True
+        directory = os.path.abspath(os.path.expanduser(directory))
+        if not os.path.isdir(directory):
+            self.emit_event('error', message="المجلد غير موجود", directory=directory)
+            return 2
+        
+        loop = asyncio.get_running_loop()
+        watcher = FolderWatcher(
+            directory,
+            recursive,
+            float(self.config.get('watch_stable_seconds', 5)),
+            float(self.config.get('watch_poll_interval', 2))
+        )
+        watcher.start(loop)
+        self.emit_event('watch', directory=directory, backend=watcher.backend, chats=chat_ids)
+        
+        uploads = set()
+        
+        def submit(files: List[Dict[str, Any]]):
+            self.emit_event('detected', paths=[f['path'] for f in files])
+            task = asyncio.create_task(self.upload_batch(files, chat_ids[0], chat_ids[1:]))
+            uploads.add(task)
+            task.add_done_callback(uploads.discard)
+        
+        # ملفات اكتُشفت في تشغيل سابق ولم يكتمل رفعها
+        leftovers = [
+            self.build_file_info(job['path'])
+            for job in self.store.unfinished()
+            if job['chat_id'] == str(chat_ids[0]) and job['path'].startswith(directory + os.sep)
+        ]
+        leftovers = [f for f in leftovers if f]
+        if leftovers:
+            submit(leftovers)
+        
+        try:
+            async for paths in watcher.ready_files():
+                files = [info for info in map(self.build_file_info, paths) if info]
+                if files:
+                    submit(files)
+        finally:
+            watcher.stop(loop)
+            for task in uploads:
+                task.cancel()
+        return 0
     
     async def run_interactive_explorer(self):
         """تشغيل المستكشف التفاعلي المتقدم"""
@@ -796,8 +3732,15 @@ class TelegramVideoUploader:
             self.print_current_path()
             self.print_status_bar()
             
-            items = self.scan_directory(self.current_path)
+            items = await asyncio.get_running_loop().run_in_executor(
+                self.scan_executor, self.scan_directory, self.current_path
+            )
+            self.refresh_folder_sizes(items)
             items_count, total_pages = self.display_items(items, current_page)
+            if self.recursive_search and self.recursive_search.get('truncated'):
+                print(f"{Colors.WARNING}⚠️ تُعرض أول {SEARCH_RESULTS_LIMIT} نتيجة فقط حسب الترتيب الحالي، "
+                      f"ضيّق البحث لرؤية الباقي{Colors.ENDC}")
+            self.prefetch_media_info(items[current_page * 15:(current_page + 1) * 15])
             
             if items_count == 0 and items:
                 current_page = 0
@@ -808,14 +3751,28 @@ class TelegramVideoUploader:
                 self.display_selected_files()
             
             # الحصول على الأمر
-            command = input(f"\n{Colors.GREEN}💻 أدخل الأمر: {Colors.ENDC}").strip().lower()
+            command = (await self.ask(f"\n{Colors.GREEN}💻 أدخل الأمر: {Colors.ENDC}")).strip().lower()
             
             # معالجة الأوامر
-            if command == 'q':
+            if command == '':
+                # إعادة رسم الشاشة لتحديث سطر حالة المهام
+                continue
+            
+            elif command == 'q':
+                if self.job_manager.busy:
+                    answer = (await self.ask(f"{Colors.WARNING}⚠️ توجد مهام رفع غير منتهية، الخروج يوقفها "
+                                             f"(وتُعرض للاستئناف في الجلسة القادمة). خروج؟ (y/n): {Colors.ENDC}")).strip().lower()
+                    if answer != 'y':
+                        continue
+                await self.job_manager.shutdown()
                 print(f"{Colors.CYAN}👋 إلى اللقاء!{Colors.ENDC}")
+                self.shutdown_workers()
                 break
             
             elif command == 'r':
+                self.invalidate_directory()
+                if self.recursive_search:
+                    self.file_index.refresh(self.recursive_search['root'])
                 current_page = 0
                 continue
             
@@ -835,7 +3792,7 @@ class TelegramVideoUploader:
                 continue
             
             elif command == 'c':
-                self.selected_files = []
+                self.selected_files.clear()
                 print(f"{Colors.GREEN}✅ تم مسح جميع المختارات!{Colors.ENDC}")
                 await asyncio.sleep(1)
                 continue
@@ -843,43 +3800,75 @@ class TelegramVideoUploader:
             elif command == 'a':
                 # اختيار جميع الملفات
                 files_only = [item for item in items if item['type'] == 'file']
-                self.selected_files = files_only.copy()
+                self.selected_files = SelectionSet(files_only)
                 print(f"{Colors.GREEN}✅ تم اختيار {len(files_only)} ملف!{Colors.ENDC}")
                 await asyncio.sleep(1)
                 continue
             
+            elif command.startswith('a '):
+                # إضافة الملفات المطابقة لنمط glob إلى المختارات
+                pattern = command[2:].strip()
+                matches = [
+                    item for item in items
+                    if item['type'] == 'file' and fnmatch.fnmatch(item['name'].lower(), pattern)
+                ]
+                added = self.selected_files.update(matches)
+                print(f"{Colors.GREEN}✅ تطابق {len(matches)} ملف مع '{pattern}'، أضيف منها {added}{Colors.ENDC}")
+                await asyncio.sleep(1)
+                continue
+            
             elif command == 'u':
                 await self.upload_selected_files()
                 continue
             
             elif command.startswith('s '):
-                # اختيار/إلغاء اختيار ملف
+                # اختيار/إلغاء اختيار ملف أو نطاق ملفات
+                spec = command[2:].strip()
                 try:
-                    file_num = int(command.split()[1])
-                    start_idx = current_page * 15
-                    actual_idx = file_num - 1
-                    
-                    if 0 <= actual_idx < len(items):
-                        item = items[actual_idx]
-                        if item['type'] == 'file':
-                            # البحث في المختارات
-                            existing = [f for f in self.selected_files if f['path'] == item['path']]
-                            if existing:
-                                self.selected_files = [f for f in self.selected_files if f['path'] != item['path']]
-                                print(f"{Colors.GREEN}➖ تم إلغاء اختيار: {item['name']}{Colors.ENDC}")
-                            else:
-                                self.selected_files.append(item)
-                                print(f"{Colors.GREEN}➕ تم اختيار: {item['name']}{Colors.ENDC}")
-                            await asyncio.sleep(1)
-                        else:
-                            print(f"{Colors.FAIL}❌ يمكن اختيار الملفات فقط!{Colors.ENDC}")
-                            await asyncio.sleep(1)
+                    indexes = parse_index_ranges(spec, len(items))
+                except ValueError:
+                    print(f"{Colors.FAIL}❌ استخدم: s رقم_الملف أو s 3-10 أو s 1,4,7-9 (من 1 إلى {len(items)}){Colors.ENDC}")
+                    await asyncio.sleep(1)
+                    continue
+                
+                range_files = [items[i] for i in indexes if items[i]['type'] == 'file']
+                if not range_files:
+                    print(f"{Colors.FAIL}❌ يمكن اختيار الملفات فقط!{Colors.ENDC}")
+                elif len(indexes) == 1:
+                    item = range_files[0]
+                    if self.selected_files.toggle(item):
+                        print(f"{Colors.GREEN}➕ تم اختيار: {item['name']}{Colors.ENDC}")
                     else:
-                        print(f"{Colors.FAIL}❌ رقم غير صحيح!{Colors.ENDC}")
+                        print(f"{Colors.GREEN}➖ تم إلغاء اختيار: {item['name']}{Colors.ENDC}")
+                elif all(item in self.selected_files for item in range_files):
+                    # النطاق مختار بالكامل: إلغاء اختياره
+                    for item in range_files:
+                        self.selected_files.discard(item['path'])
+                    print(f"{Colors.GREEN}➖ تم إلغاء اختيار {len(range_files)} ملف{Colors.ENDC}")
+                else:
+                    added = self.selected_files.update(range_files)
+                    print(f"{Colors.GREEN}➕ تم اختيار {added} ملف من النطاق {spec}{Colors.ENDC}")
+                await asyncio.sleep(1)
+                continue
+            
+            elif command.startswith('//'):
+                # بحث شامل من فهرس الملفات (يُحدَّث في الخلفية)
+                text = command[2:].strip()
+                if not text:
+                    self.recursive_search = None
+                    print(f"{Colors.GREEN}🔎 تم إلغاء البحث الشامل{Colors.ENDC}")
+                else:
+                    try:
+                        query = parse_search_query(text)
+                    except ValueError:
+                        print(f"{Colors.FAIL}❌ حجم غير صحيح في الاستعلام! مثال: // *.mkv >1gb{Colors.ENDC}")
                         await asyncio.sleep(1)
-                except (ValueError, IndexError):
-                    print(f"{Colors.FAIL}❌ استخدم: s رقم_الملف{Colors.ENDC}")
-                    await asyncio.sleep(1)
+                        continue
+                    self.recursive_search = {'root': self.current_path, 'text': text, **query}
+                    self.file_index.refresh(self.current_path)
+                    print(f"{Colors.GREEN}🔎 بحث شامل عن: '{text}' (الفهرس يُحدَّث في الخلفية، 'r' لإعادة العرض){Colors.ENDC}")
+                current_page = 0
+                await asyncio.sleep(1)
                 continue
             
             elif command.startswith('/ '):
@@ -920,9 +3909,14 @@ class TelegramVideoUploader:
                 await asyncio.sleep(1)
                 continue
             
+            elif command == 'j':
+                # إدارة مهام الرفع في الخلفية
+                await self.manage_jobs()
+                continue
+            
             elif command == 'b':
                 # إدارة الإشارات المرجعية
-                self.manage_bookmarks()
+                await self.manage_bookmarks()
                 current_page = 0
                 continue
             
@@ -933,7 +3927,7 @@ class TelegramVideoUploader:
                     if 1 <= file_num <= len(items):
                         item = items[file_num - 1]
                         if item['type'] == 'file':
-                            self.display_file_info(item['path'])
+                            await self.display_file_info(item['path'])
                         else:
                             print(f"{Colors.FAIL}❌ يمكن عرض معلومات الملفات فقط!{Colors.ENDC}")
                             await asyncio.sleep(1)
@@ -960,8 +3954,7 @@ class TelegramVideoUploader:
                             current_page = 0
                         elif selected_item['type'] == 'file':
                             # اختيار الملف
-                            if selected_item not in self.selected_files:
-                                self.selected_files.append(selected_item)
+                            if self.selected_files.add(selected_item):
                                 print(f"{Colors.GREEN}✅ تم اختيار: {selected_item['name']}{Colors.ENDC}")
                             else:
                                 print(f"{Colors.CYAN}ℹ️ الملف مختار مسبقاً: {selected_item['name']}{Colors.ENDC}")
@@ -978,20 +3971,61 @@ class TelegramVideoUploader:
                 print(f"{Colors.FAIL}❌ أمر غير مفهوم! استخدم 'h' لعرض المساعدة{Colors.ENDC}")
                 await asyncio.sleep(1)
 
-async def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """قراءة معاملات سطر الأوامر"""
+    parser = argparse.ArgumentParser(
+        description="رفع الملفات إلى تيليجرام. بدون --chat يعمل المستكشف التفاعلي."
+    )
+    parser.add_argument('paths', nargs='*', help="ملفات أو أنماط glob أو مجلدات للرفع")
+    parser.add_argument('-c', '--chat', action='append', dest='chats', default=[],
+                        help="معرف القناة (@username أو رقم)، يمكن تكراره للرفع لعدة قنوات")
+    parser.add_argument('-t', '--type', choices=['auto', 'video', 'document'], help="نوع الرفع")
+    parser.add_argument('-w', '--workers', type=int, help="عدد الرفعات المتزامنة")
+    parser.add_argument('-r', '--recursive', action='store_true', help="تضمين المجلدات الفرعية و ** في الأنماط")
+    parser.add_argument('--watch', metavar='DIR', help="مراقبة مجلد ورفع الملفات الجديدة فور اكتمالها")
+    parser.add_argument('--album', action='store_true', help="تجميع الملفات المتوافقة في ألبومات (حتى 10 في الطلب)")
+    args = parser.parse_args(argv)
+    if (args.paths or args.watch) and not args.chats:
+        parser.error("الوضع غير التفاعلي يتطلب --chat")
+    if args.chats and not (args.paths or args.watch):
+        parser.error("حدد ملفات أو مجلدات للرفع أو مجلداً للمراقبة عبر --watch")
+    return args
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
     """الدالة الرئيسية"""
+    args = parse_args(argv)
     if not BOT_TOKEN or BOT_TOKEN == "YOUR_BOT_TOKEN_HERE":
         print(f"{Colors.FAIL}❌ يرجى تعديل BOT_TOKEN في الكود!{Colors.ENDC}")
-        return
+        return 2
     
     uploader = TelegramVideoUploader(BOT_TOKEN)
+    if args.type:
+        uploader.config['default_upload_type'] = args.type
+    if args.album:
+        uploader.config['album_mode'] = True
+    if args.workers:
+        uploader.config['upload_workers'] = args.workers
+        uploader.upload_slots = asyncio.Semaphore(max(1, args.workers))
+        uploader.bot = uploader.create_bot(BOT_TOKEN)
+    
+    if args.watch:
+        return await uploader.run_watch(args.watch, args.chats, args.recursive)
+    if args.chats:
+        return await uploader.run_headless(args.paths, args.chats, args.recursive)
+    
+    # المستكشف يرسم الشاشة بنفسه ومهام الرفع تعمل في الخلفية أثناءه، فالسجل يُكتب في الملف فقط
+    logging.getLogger().removeHandler(console_handler)
     await uploader.run_interactive_explorer()
+    return 0
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        sys.exit(asyncio.run(main()))
     except KeyboardInterrupt:
         print(f"\n\n{Colors.CYAN}👋 تم إيقاف البرنامج!{Colors.ENDC}")
+        sys.exit(130)
     except Exception as e:
         print(f"{Colors.FAIL}❌ خطأ غير متوقع: {e}{Colors.ENDC}")
         logger.exception("خطأ في التشغيل:")
+        sys.exit(1)